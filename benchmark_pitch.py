@@ -0,0 +1,152 @@
+#!/usr/bin/env python
+
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+import numpy as np
+
+# pygame greets on stdout when imported, which would corrupt the JSON report
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+from data.capture import load_audio_file, make_synthetic_signal
+from data.decimator import decimator_delay
+from data.pitch_detector import PitchDetector
+
+AUBIO_METHODS = ["yin", "yinfft", "mcomb", "schmitt", "specacf"]
+NUMPY_METHODS = ["yin", "yinfft"]
+
+# yinfft uses the in-game tolerance, the other methods their aubio defaults
+TOLERANCES = {"yin": 0.15, "yinfft": 0.8, "specacf": 0.85}
+
+# Estimates further off than this count as gross errors
+GROSS_ERROR_MIDI = 1.0
+
+parser = argparse.ArgumentParser(description='Benchmark pitch detection methods, window and hop sizes')
+parser.add_argument('--sample_rates', type=int, nargs='+', default=[22050, 44100])
+parser.add_argument('--buf_sizes', type=int, nargs='+', default=[1024, 2048, 4096])
+parser.add_argument('--hop_sizes', type=int, nargs='+', default=[256, 512, 1024])
+parser.add_argument('--decimations', type=int, nargs='+', default=[1], help="Downsampling factors before the analysis")
+parser.add_argument('--backends', nargs='+', default=['aubio', 'numpy'])
+parser.add_argument('--methods', nargs='+', default=AUBIO_METHODS)
+parser.add_argument(
+    '--corpus',
+    nargs='+',
+    default=['synthetic:glide', 'synthetic:vibrato', 'synthetic:sine', 'synthetic:noise'],
+    help="synthetic:<kind> or paths to .wav/.npy recordings. A recording's ground truth is read from "
+         "<recording>.pitch.npy (MIDI per sample at the benchmark sample rate, NaN where unvoiced) if that file exists")
+parser.add_argument('--duration', type=float, default=4.0, help="Length of every synthetic signal in seconds")
+parser.add_argument('--output', help="Write the JSON results to this file instead of stdout")
+args = parser.parse_args()
+
+
+def load_corpus(sample_rate):
+    '''list of (name, mono signal, ground truth MIDI per sample or None)'''
+    corpus = []
+    for entry in args.corpus:
+        if entry.startswith("synthetic:"):
+            kind = entry.partition(":")[2]
+            signal, ground_truth = make_synthetic_signal(
+                kind, sample_rate, duration=args.duration, midi=45.0, midi_end=62.0, seed=0)
+        else:
+            signal = load_audio_file(entry, sample_rate)[:, 0]
+            ground_truth = None
+            truth_path = os.path.splitext(entry)[0] + ".pitch.npy"
+            if os.path.exists(truth_path):
+                ground_truth = np.load(truth_path)
+        corpus.append((entry, np.ascontiguousarray(signal, dtype=np.float32), ground_truth))
+    return corpus
+
+
+def run_config(backend, method, sample_rate, buf_size, hop_size, decimation, corpus):
+    hop_times = []
+    errors = []
+    voiced_hops = missed_hops = unvoiced_hops = false_voiced_hops = 0
+    cpu_time = 0.0
+
+    for name, signal, ground_truth in corpus:
+        detector = PitchDetector(
+            hop_size, sample_rate, TOLERANCES.get(method, 0.8), backend=backend, method=method, buf_size=buf_size,
+            decimation=decimation)
+        num_hops = len(signal) // hop_size
+        pitches = np.zeros(num_hops)
+
+        cpu_start = time.process_time()
+        for i in range(num_hops):
+            hop = signal[i * hop_size:(i + 1) * hop_size]
+            start = time.perf_counter()
+            pitch, _ = detector.get_pitch_confidence_tuple(hop)
+            hop_times.append(time.perf_counter() - start)
+            pitches[i] = pitch
+        cpu_time += time.process_time() - cpu_start
+
+        if ground_truth is None:
+            continue
+
+        # Every estimate describes the window ending with its hop, compare against the window center.
+        # The first hops only see a partially filled window and are skipped.
+        for i in range(buf_size // hop_size, num_hops):
+            center = (i + 1) * hop_size - buf_size // 2 - decimator_delay(decimation)
+            expected = ground_truth[center]
+            if np.isnan(expected):
+                unvoiced_hops += 1
+                false_voiced_hops += int(pitches[i] > 0)
+            else:
+                voiced_hops += 1
+                if pitches[i] <= 0:
+                    missed_hops += 1
+                else:
+                    errors.append(abs(pitches[i] - expected))
+
+    hop_times = np.array(hop_times) * 1000
+    result = {
+        "backend": backend,
+        "method": method,
+        "sample_rate": sample_rate,
+        "buf_size": buf_size,
+        "hop_size": hop_size,
+        "decimation": decimation,
+        "hops": len(hop_times),
+        "hops_per_cpu_second": len(hop_times) / cpu_time if cpu_time > 0 else None,
+        "p50_hop_ms": float(np.percentile(hop_times, 50)),
+        "p99_hop_ms": float(np.percentile(hop_times, 99)),
+        # Waiting for a full hop, plus the delay of the analysis window center behind its newest sample
+        "algorithmic_latency_ms": 1000.0 * (hop_size + buf_size / 2 + decimator_delay(decimation)) / sample_rate,
+    }
+    if voiced_hops:
+        errors = np.array(errors)
+        result["voiced_miss_rate"] = missed_hops / voiced_hops
+        result["median_error_midi"] = float(np.median(errors)) if len(errors) else None
+        result["mean_error_midi"] = float(np.mean(errors)) if len(errors) else None
+        result["gross_error_rate"] = float(np.mean(errors > GROSS_ERROR_MIDI)) if len(errors) else None
+    if unvoiced_hops:
+        result["false_voiced_rate"] = false_voiced_hops / unvoiced_hops
+    return result
+
+
+results = []
+for sample_rate in args.sample_rates:
+    corpus = load_corpus(sample_rate)
+    for backend, buf_size, hop_size, decimation in itertools.product(
+            args.backends, args.buf_sizes, args.hop_sizes, args.decimations):
+        if hop_size > buf_size or hop_size % decimation:
+            continue
+        methods = [m for m in args.methods if backend == "aubio" or m in NUMPY_METHODS]
+        for method in methods:
+            result = run_config(backend, method, sample_rate, buf_size, hop_size, decimation, corpus)
+            results.append(result)
+            print("{backend:5s} {method:7s} sr {sample_rate:5d} buf {buf_size:4d} hop {hop_size:4d} /{decimation}: "
+                  "{hops_per_cpu_second:8.0f} hops/s, p99 {p99_hop_ms:.3f} ms".format(**result), file=sys.stderr)
+
+report = {
+    "corpus": args.corpus,
+    "python": sys.version.split()[0],
+    "numpy": np.__version__,
+    "results": results,
+}
+if args.output:
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+else:
+    print(json.dumps(report, indent=2))
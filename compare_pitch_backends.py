@@ -0,0 +1,49 @@
+#!/usr/bin/env python
+
+import argparse
+import sys
+import numpy as np
+from data.pitch_detector import PitchDetector
+
+parser = argparse.ArgumentParser(description='Compare the aubio and numpy pitch backends on synthetic tones')
+parser.add_argument('--sample_rate', type=int, default=44100)
+parser.add_argument('--hop_size', type=int, default=1024)
+parser.add_argument('--buf_size', type=int, default=4096)
+parser.add_argument('--max_error', type=float, default=0.1, help="Maximum pitch difference in MIDI notes")
+args = parser.parse_args()
+
+
+def make_tone(midi, sample_rate, num_samples):
+    '''fundamental plus two weaker harmonics, like a sung vowel'''
+    frequency = 440 * 2 ** ((midi - 69) / 12)
+    t = np.arange(num_samples) / sample_rate
+    tone = sum(amplitude * np.sin(2 * np.pi * k * frequency * t) for k, amplitude in ((1, .4), (2, .15), (3, .05)))
+    return tone.astype(np.float32)
+
+
+num_hops = 12
+max_difference = 0.0
+for method, tolerance in (("yinfft", 0.8), ("yin", 0.15)):
+    for midi in np.arange(36, 84, 1.5):
+        detectors = {
+            backend: PitchDetector(args.hop_size, args.sample_rate, tolerance, backend=backend, method=method,
+                                   buf_size=args.buf_size)
+            for backend in ("aubio", "numpy")
+        }
+        tone = make_tone(midi, args.sample_rate, num_hops * args.hop_size)
+
+        # Skip hops until the analysis window is filled
+        results = {}
+        for backend, detector in detectors.items():
+            for i in range(num_hops):
+                pitch, confidence = detector.get_pitch_confidence_tuple(tone[i * args.hop_size:(i + 1) * args.hop_size])
+            results[backend] = float(pitch)
+
+        difference = abs(results["aubio"] - results["numpy"])
+        max_difference = max(max_difference, difference)
+        print("{:7s} midi {:5.1f}: aubio {:7.3f}, numpy {:7.3f}, difference {:.4f}".format(
+            method, midi, results["aubio"], results["numpy"], difference))
+
+print("Maximum difference: {:.4f} MIDI notes".format(max_difference))
+if max_difference > args.max_error:
+    sys.exit(1)
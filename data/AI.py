@@ -1,35 +1,89 @@
+import random
+from . import tools
+
+# How the AI plays at each difficulty:
+#   reaction_time: seconds between a change of the ball's course and the AI noticing it
+#   aim_error: standard deviation of where it expects the ball, in paddle heights
+#   max_speed: how fast it can move its paddle, in screen heights per second
+DIFFICULTIES = {
+    'easy': {'reaction_time': 0.45, 'aim_error': 0.6, 'max_speed': 0.35},
+    'medium': {'reaction_time': 0.3, 'aim_error': 0.35, 'max_speed': 0.55},
+    'hard': {'reaction_time': 0.15, 'aim_error': 0.15, 'max_speed': 0.85},
+}
 
-import pygame as pg
 
 class AIPaddle:
-    def __init__(self, screen_rect, ball_rect, difficulty):
+    '''
+    Steers `paddle` to where the ball will cross it. The crossing, walls included, is solved in closed
+    form whenever the ball changes course, after a reaction delay, and missed by a random aim error.
+    Between those moments a step only moves the paddle towards the expected crossing at a bounded speed.
+    '''
+    def __init__(self, screen_rect, difficulty, paddle, rng=None):
         self.difficulty = difficulty
         self.screen_rect = screen_rect
-        self.ball_Rect = ball_rect
-        self.move_up = False
-        self.move_down = False
-        self.screen_response_area_rect = self.screen_rect
-        
-        if self.difficulty == 'hard':
-            num = 1
-        elif self.difficulty == 'medium':
-            num = 2
-        elif self.difficulty == 'easy':
-            num = 3
-            
-        surf = pg.Surface([self.screen_rect.width / num, self.screen_rect.height])
-        self.screen_response_area_rect = surf.get_rect()
-        
-    def update(self, ball_rect, ball, paddle_rect):
-        if self.screen_response_area_rect.colliderect(ball_rect):
-            if ball_rect.centery < paddle_rect.centery:
-                if not ball.moving_away_from_AI:
-                    self.move_up = True
-            elif ball_rect.centery > paddle_rect.centery:
-                if not ball.moving_away_from_AI:
-                    self.move_down = True
-            
+        self.paddle = paddle
+        self.random = rng or random
+        settings = DIFFICULTIES[difficulty]
+        self.reaction_time = settings['reaction_time']
+        self.aim_error = settings['aim_error'] * paddle.rect.height
+        self.max_speed = settings['max_speed'] * screen_rect.height
+        # +1 for a paddle on the left, whose incoming ball has vel_x < 0, -1 for one on the right
+        self.facing = 1 if paddle.rect.centerx < screen_rect.centerx else -1
+        self.reset()
+
     def reset(self):
-        '''reset upon each iteration of update'''
-        self.move_up = False
-        self.move_down = False
+        self.time = 0.0
+        # (direction, speed) of the ball when the AI last looked, and when it will look again
+        self.seen_course = None
+        self.react_time = None
+        # Horizontal direction of the approach the aim error was drawn for
+        self.aimed_vel_x = None
+        self.aim_offset = 0.0
+        self.target_y = self.screen_rect.centery
+        self.aim_y = float(self.paddle.rect.centery)
+
+    def update(self, ball, time_delta):
+        self.time += time_delta
+        course = (ball.vel[0], ball.vel[1], ball.speed)
+        if course != self.seen_course:
+            self.seen_course = course
+            if self.react_time is None:
+                self.react_time = self.time + self.reaction_time
+        if self.react_time is not None and self.time >= self.react_time:
+            self.react_time = None
+            self.target_y = self.predict(ball)
+
+        max_move = self.max_speed * time_delta
+        self.aim_y += min(max(self.target_y - self.aim_y, -max_move), max_move)
+        self.paddle.update_desired_y(self.aim_y - self.paddle.rect.height / 2)
+
+    def predict(self, ball):
+        '''center y the paddle should be at when the ball arrives, the middle of the screen while it leaves'''
+        vel_x = ball.vel[0] * ball.speed * tools.REFERENCE_FPS
+        vel_y = ball.vel[1] * ball.speed * tools.REFERENCE_FPS
+        if vel_x * self.facing >= 0:
+            self.aimed_vel_x = None
+            return self.screen_rect.centery
+
+        # One guess per approach, a new serve or return. Guessing again at every wall bounce would
+        # average the error away.
+        if ball.vel[0] != self.aimed_vel_x:
+            self.aimed_vel_x = ball.vel[0]
+            self.aim_offset = self.random.gauss(0, self.aim_error)
+
+        if self.facing > 0:
+            face_x = self.paddle.rect.right + ball.width / 2
+        else:
+            face_x = self.paddle.rect.left - ball.width / 2
+        arrival = (face_x - ball.true_pos[0]) / vel_x
+        if arrival < 0:
+            # Past the paddle already
+            return self.target_y
+
+        # Unfold the bounces off the top and bottom walls: the path is a triangle wave between them
+        low = self.screen_rect.top + ball.height / 2
+        span = self.screen_rect.bottom - ball.height / 2 - low
+        offset = (ball.true_pos[1] + vel_y * arrival - low) % (2 * span)
+        if offset > span:
+            offset = 2 * span - offset
+        return low + offset + self.aim_offset
@@ -1,5 +1,6 @@
 import pygame as pg
 import os
+from ..tools import Font, font_lock
         
 class Button:
     def __init__(self, rect, **kwargs):
@@ -24,11 +25,12 @@ class Button:
         self.text = kwargs['text']
         
     def render_font(self, text, filename, size):
-        if not filename:
-            f = pg.font.SysFont('arial', size)
-        else:
-            f = Font.load(self.font, size)
-        font = f.render(text, 1, self.text_color)
+        with font_lock:
+            if not filename:
+                f = pg.font.SysFont('arial', size)
+            else:
+                f = Font.load(self.font, size)
+            font = f.render(text, 1, self.text_color)
         rect = font.get_rect()
         return (font, rect)
         
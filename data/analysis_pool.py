@@ -0,0 +1,197 @@
+from multiprocessing import shared_memory
+import multiprocessing
+import os
+import time
+import numpy as np
+from .pitch_detector import PitchDetector
+from .pitch_worker import SharedRings, NUM_CHUNKS, analyse_chunk
+
+
+class WorkerSource(object):
+    """
+    Worker side of one PoolSource: its rings, its pitch detector and the next chunk to analyse
+    """
+    def __init__(self, settings):
+        self.shm = shared_memory.SharedMemory(name=settings["shm_name"])
+        self.rings = SharedRings(self.shm, settings["hop_size"], settings["num_channels"])
+        self.pitch_detector = PitchDetector(
+            settings["hop_size"], settings["sample_rate"], settings["pitch_tolerance"], settings["num_channels"],
+            settings["pitch_backend"], buf_size=settings["buf_size"], voice_gate=settings["voice_gate"],
+            decimation=settings["decimation"])
+        self.signals = np.zeros((settings["num_channels"], settings["hop_size"]), dtype=np.float32)
+        self.deadline = settings["deadline"]
+        self.next_index = self.rings.sample_ring.write_index
+
+    def next_deadline(self, now):
+        """
+        Deadline of the oldest chunk worth analysing, or None if nothing is pending.
+        Chunks past their deadline are dropped as long as a newer one is waiting.
+        """
+        sample_ring = self.rings.sample_ring
+        write_index = sample_ring.write_index
+        if self.next_index >= write_index:
+            return None
+
+        # The slot currently being written by the parent is never safe to read
+        if write_index - self.next_index >= NUM_CHUNKS:
+            self.next_index = write_index - NUM_CHUNKS + 1
+        while self.next_index < write_index - 1:
+            if sample_ring.timestamps[self.next_index % NUM_CHUNKS] + self.deadline >= now:
+                break
+            self.next_index += 1
+        return sample_ring.timestamps[self.next_index % NUM_CHUNKS] + self.deadline
+
+    def analyse_next(self):
+        # A torn chunk is skipped
+        analyse_chunk(self.rings, self.pitch_detector, self.signals, self.next_index)
+        self.next_index += 1
+
+    def close(self):
+        # Numpy views must be gone before the shared memory can be closed
+        self.rings = None
+        self.pitch_detector = None
+        self.shm.close()
+
+
+def run_pool_worker(source_settings, chunk_ready, stop_event):
+    """
+    Entry point of a pool process: analyse the chunks of all its sources, earliest deadline first
+    """
+    sources = [WorkerSource(settings) for settings in source_settings]
+    try:
+        while not stop_event.is_set():
+            chunk_ready.acquire(timeout=0.1)
+
+            while not stop_event.is_set():
+                now = time.perf_counter()
+                next_source = None
+                next_deadline = None
+                for source in sources:
+                    deadline = source.next_deadline(now)
+                    if deadline is not None and (next_deadline is None or deadline < next_deadline):
+                        next_source, next_deadline = source, deadline
+                if next_source is None:
+                    break
+                next_source.analyse_next()
+    finally:
+        for source in sources:
+            source.close()
+
+
+class PoolSource(object):
+    """
+    Shared memory rings of one MicController whose chunks are analysed by an AnalysisPool.
+    Offers the same interface as a PitchWorker, starting and stopping it starts or stops the whole pool.
+    """
+    def __init__(self, pool, worker, hop_size, sample_rate, pitch_tolerance, num_channels, pitch_backend, buf_size,
+                 voice_gate, decimation, deadline):
+        self.pool = pool
+        self.worker = worker
+        self.shm = shared_memory.SharedMemory(create=True, size=SharedRings.required_bytes(hop_size, num_channels))
+        self.rings = SharedRings(self.shm, hop_size, num_channels)
+        self.settings = {
+            "shm_name": self.shm.name,
+            "hop_size": hop_size,
+            "sample_rate": sample_rate,
+            "pitch_tolerance": pitch_tolerance,
+            "num_channels": num_channels,
+            "pitch_backend": pitch_backend,
+            "buf_size": buf_size,
+            "voice_gate": voice_gate,
+            "decimation": decimation,
+            "deadline": deadline,
+        }
+
+    @property
+    def pitch_rings(self) -> list:
+        return self.rings.pitch_rings
+
+    @property
+    def backlog(self) -> int:
+        return self.rings.backlog
+
+    def start(self):
+        # The pool is shared, its owner starts and stops it for all sources at once
+        pass
+
+    def submit(self, samples, timestamp):
+        self.rings.sample_ring.write(samples, timestamp)
+        self.pool.chunk_ready[self.worker].release()
+
+    def stop(self):
+        pass
+
+    def close(self):
+        if self.rings is not None:
+            self.rings = None
+            self.shm.close()
+            self.shm.unlink()
+
+
+class AnalysisPool(object):
+    """
+    Bounded pool of pitch analysis processes shared by any number of MicControllers.
+
+    Every source is pinned to one process, which keeps its pitch detector state, and processes take
+    sources round robin. A process always analyses the pending chunk with the earliest deadline
+    (chunk timestamp plus the source's `deadline`) and drops chunks that missed theirs while newer
+    ones wait. A slow or overloaded process then costs resolution instead of latency.
+    Chunk timestamps must come from time.perf_counter().
+    """
+    def __init__(self, num_workers=None):
+        if not num_workers:
+            # Leave one core to the game loop and the capture callbacks
+            num_workers = max(1, (os.cpu_count() or 2) - 1)
+        self.num_workers = num_workers
+        self.sources = []
+
+        # Spawn instead of fork, the parent runs SDL threads
+        self.context = multiprocessing.get_context("spawn")
+        self.chunk_ready = [self.context.Semaphore(0) for _ in range(num_workers)]
+        self.stop_event = self.context.Event()
+        self.processes = []
+
+    def add_source(self, hop_size, sample_rate, pitch_tolerance, num_channels=1, pitch_backend="aubio", buf_size=4096,
+                   voice_gate=False, decimation=1, deadline=None) -> PoolSource:
+        """
+        Register the rings of one capture device. `deadline` defaults to two hops.
+        Sources added after `start` are analysed from the next start on.
+        """
+        if deadline is None:
+            deadline = 2 * hop_size / sample_rate
+        source = PoolSource(self, len(self.sources) % self.num_workers, hop_size, sample_rate, pitch_tolerance,
+                            num_channels, pitch_backend, buf_size, voice_gate, decimation, deadline)
+        self.sources.append(source)
+        return source
+
+    def start(self):
+        if self.processes:
+            return
+        self.stop_event.clear()
+        for worker, chunk_ready in enumerate(self.chunk_ready):
+            source_settings = [source.settings for source in self.sources if source.worker == worker]
+            if not source_settings:
+                continue
+            process = self.context.Process(
+                target=run_pool_worker, args=(source_settings, chunk_ready, self.stop_event), daemon=True)
+            process.start()
+            self.processes.append(process)
+
+    def stop(self):
+        if not self.processes:
+            return
+        self.stop_event.set()
+        for chunk_ready in self.chunk_ready:
+            chunk_ready.release()
+        for process in self.processes:
+            process.join(timeout=1.0)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        self.processes = []
+
+    def close(self):
+        self.stop()
+        for source in self.sources:
+            source.close()
+        self.sources = []
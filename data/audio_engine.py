@@ -0,0 +1,82 @@
+import numpy as np
+from .audio_input import MicController
+from .analysis_pool import AnalysisPool
+from .session_recorder import SessionRecorder
+
+
+class AudioEngine(object):
+    """
+    Any number of capture devices, every channel of every device is one player.
+
+    With `use_pitch_worker` all devices share one `analysis_pool.AnalysisPool` of at most `num_workers`
+    processes (default: one per core left to the game loop, and never more than there are devices), so four
+    microphones do not need four processes. Only the engine starts and stops the shared pool, in `start` and
+    `stop`: a `MicController` starting or stopping its `PoolSource` leaves the pool running for the others.
+    The game reads every player once per frame with `read_positions`. With `record_path` the whole session
+    is recorded into that directory, see `session_recorder.SessionRecorder`. The remaining keyword
+    arguments are passed on to every `MicController`.
+    """
+    def __init__(self, device_names, sample_rate, buffer_size, pitch_tolerance, min_confidence, use_pitch_worker=False,
+                 num_workers=None, analysis_deadline=None, record_path=None, **mic_settings):
+        self.analysis_pool = None
+        if use_pitch_worker:
+            # Workers without a device are never started
+            self.analysis_pool = AnalysisPool(num_workers)
+        self.recorder = SessionRecorder(record_path) if record_path else None
+
+        self.mic_controllers = []
+        try:
+            for device_name in device_names:
+                self.mic_controllers.append(MicController(
+                    device_name=device_name,
+                    sample_rate=sample_rate,
+                    buffer_size=buffer_size,
+                    pitch_tolerance=pitch_tolerance,
+                    min_confidence=min_confidence,
+                    analysis_pool=self.analysis_pool,
+                    analysis_deadline=analysis_deadline,
+                    recorder=self.recorder,
+                    **mic_settings
+                ))
+        except Exception:
+            # e.g. a missing microphone: release the pool and the devices opened so far
+            self.close()
+            raise
+
+        # One entry per player, in device then channel order
+        self.channels = [channel for mic_controller in self.mic_controllers for channel in mic_controller.channels]
+        self.positions = np.full(len(self.channels), -1.0)
+
+    def start(self):
+        if self.analysis_pool is not None:
+            self.analysis_pool.start()
+        for mic_controller in self.mic_controllers:
+            mic_controller.start()
+
+    def stop(self):
+        for mic_controller in self.mic_controllers:
+            mic_controller.stop()
+        if self.analysis_pool is not None:
+            self.analysis_pool.stop()
+
+    def close(self):
+        # Every device stops submitting before the pool goes away
+        self.stop()
+        for mic_controller in self.mic_controllers:
+            mic_controller.close()
+        if self.analysis_pool is not None:
+            self.analysis_pool.close()
+        if self.recorder is not None:
+            self.recorder.close()
+
+    def read_positions(self, present_time=None) -> np.ndarray:
+        """
+        Drain every player's pitch stream once and return the reused array of normalized positions,
+        -1 for players without a pitch yet
+        """
+        for player, channel in enumerate(self.channels):
+            self.positions[player] = channel.get_normalized_position(present_time)
+        return self.positions
+
+    def get_telemetry(self) -> list:
+        return [mic_controller.get_telemetry() for mic_controller in self.mic_controllers]
@@ -1,112 +1,260 @@
-from pygame._sdl2 import (
-    get_audio_device_names,
-    AudioDevice,
-    AUDIO_F32,
-    AUDIO_ALLOW_FORMAT_CHANGE,
-)
-from typing import Tuple
-import multiprocessing
-import ctypes
 import numpy as np
-import aubio
-import llist
 import time
+from .capture import make_capture_source
+from .decimator import decimator_delay
+from . import latency_calibration
+from .pitch_detector import PitchDetector
+from .pitch_filters import make_pitch_filter
+from .pitch_worker import PitchWorker
+from .ring_buffer import SampleRing, PitchRing
+from .telemetry import ChannelTelemetry, MicTelemetry
+from .vocal_range import VocalRange, LOWEST_PITCH, HIGHEST_PITCH
 
 
-class PitchDetector(object):
+class MicChannel(object):
     """
-    Estimate the pitch/fundamental frequency of an audio signal
+    Pitch stream of a single capture channel, i.e. of one player.
+
+    Every pitch describes the center of its analysis window, `analysis_delay` seconds before the
+    timestamp of its hop. Filters see that measurement time, so predicting ones can extrapolate to the present.
+    With `auto_range` the pitch range mapped to the screen height follows the player's voice.
+    With a `recording` (see `session_recorder.PlayerRecording`) every drained hop is stored with the position it led to.
     """
-    def __init__(self, hop_size, sample_rate, pitch_tolerance=0.8):
-        # The hop size is the number of samples in between successive frames.
-        # The hop size should be smaller than the frame size, so that frames overlap.
-        self.pitch_o = aubio.pitch(method="yinfft", buf_size=4096, hop_size=hop_size, samplerate=sample_rate)
-        self.pitch_o.set_unit("midi")
-        self.pitch_o.set_tolerance(pitch_tolerance)
-        self.pitch_o.set_silence(-20)
+    def __init__(self, name, min_confidence, pitch_ring, pitch_filter="moving_average", analysis_delay=0.0,
+                 auto_range=True, recording=None):
+        self.name = name
+        self.min_confidence = min_confidence
+        self.pitch_ring = pitch_ring
+        self.analysis_delay = analysis_delay
+        self.last_raw_pitch = 0.0
+        # Latest decision of the voice activity gate, every hop counts as voiced without one
+        self.voiced = False
+
+        # min and max pitches are adjusted by input.
+        self.min_pitch = 40.0
+        self.max_pitch = 60.0
+        self.vocal_range = VocalRange(self.min_pitch, self.max_pitch) if auto_range else None
+        self.accepted_pitches = np.zeros(0, dtype=np.float32)
+        self.telemetry = ChannelTelemetry(name)
+        self.recording = recording
+        self.filtered_pitches = np.zeros(pitch_ring.capacity, dtype=np.float32)
+
+        self.set_pitch_filter(pitch_filter)
+
+    def set_pitch_filter(self, pitch_filter):
+        """
+        Select how accepted pitches are smoothed, see `pitch_filters.make_pitch_filter`
+        """
+        self.pitch_filter = make_pitch_filter(pitch_filter)
+
+    def set_pitch_range(self, min_pitch, max_pitch):
+        """
+        Use a calibrated range, with `auto_range` it keeps adapting from there
+        """
+        self.min_pitch = min_pitch
+        self.max_pitch = max_pitch
+        if self.vocal_range is not None:
+            self.vocal_range.seed(min_pitch, max_pitch)
 
-    def get_pitch_confidence_tuple(self, signal) -> Tuple[float, float]:
-        pitches = self.pitch_o(signal)
-        pitch = pitches[0]
-        confidence = self.pitch_o.get_confidence()
+    def get_normalized_position(self, present_time=None) -> float:
+        """
+        Smoothed pitch mapped to 0 (min_pitch) .. 1 (max_pitch), or -1 before the first accepted pitch.
+        With `present_time` (time.perf_counter() clock) the pitch is predicted for that moment.
+        """
+        # Consume every hop since the last frame instead of sampling only the latest one
+        records = self.pitch_ring.drain()
+        raw_pitches = records["pitch"]
+        raw_confidences = records["confidence"]
 
-        # print("{} / {}".format(pitch, confidence))
+        # Unvoiced hops, too low, too high or low confidence pitches are ignored
+        unvoiced = ~records["voiced"]
+        too_low = (raw_pitches < LOWEST_PITCH) & ~unvoiced
+        too_high = (raw_pitches > HIGHEST_PITCH) & ~unvoiced
+        low_confidence = (raw_confidences < self.min_confidence) & ~(unvoiced | too_low | too_high)
+        accepted = ~(unvoiced | too_low | too_high | low_confidence)
+        self.accepted_pitches = raw_pitches[accepted]
+        self.telemetry.record_drain(records, (unvoiced, too_low, too_high, low_confidence))
 
-        return pitch, confidence
+        if self.recording is None:
+            for raw_pitch, timestamp in zip(self.accepted_pitches, records["timestamp"][accepted]):
+                self.pitch_filter.update(float(raw_pitch), float(timestamp) - self.analysis_delay)
+        else:
+            # Keep the filter output after every hop, rejected hops stay NaN
+            filtered_pitches = self.filtered_pitches[:len(records)]
+            filtered_pitches[:] = np.nan
+            for index in np.flatnonzero(accepted):
+                self.pitch_filter.update(
+                    float(raw_pitches[index]), float(records["timestamp"][index]) - self.analysis_delay)
+                filtered_pitches[index] = self.pitch_filter.value
+            self.recording.add_hops(records, filtered_pitches, self.min_pitch, self.max_pitch)
+
+        if self.vocal_range is not None and len(self.accepted_pitches) > 0:
+            self.vocal_range.add(self.accepted_pitches)
+            self.min_pitch = self.vocal_range.min_pitch
+            self.max_pitch = self.vocal_range.max_pitch
+
+        if len(records) > 0:
+            self.last_raw_pitch = float(raw_pitches[-1])
+            self.voiced = bool(records["voiced"][-1])
+
+        if self.pitch_filter.value is None:
+            return -1
+
+        # While the player is silent the paddle holds its position instead of following a prediction
+        if present_time is None or not self.voiced:
+            pitch = self.pitch_filter.value
+        else:
+            pitch = self.pitch_filter.predict(present_time)
+        norm_pitch = (pitch - self.min_pitch) / (self.max_pitch - self.min_pitch)
+
+        return np.clip(norm_pitch, 0, 1)
 
 
 class MicController(object):
-    def __init__(self, device_name, sample_rate, buffer_size, pitch_tolerance, min_confidence):
+    """
+    Captures one audio device and runs pitch detection on each of its channels.
+
+    With num_channels > 1 the device is opened once, e.g. both microphones of a SingStar stereo
+    USB interface, and every channel feeds its own entry of `channels`.
+    `capture_source` selects where the audio comes from, see `capture.make_capture_source`.
+    With `calibrate_latency` the capture chunk size and analysis window are probed once per device
+    instead of using `buffer_size` and `buf_size`.
+    Hops are timestamped with `clock`, present times passed to the channels must use the same clock.
+    `auto_range` lets every channel adapt its pitch range to the voice, see `vocal_range.VocalRange`.
+    `voice_gate` skips the pitch analysis while nobody sings, see `voice_activity.VoiceActivityGate`.
+    `decimation` downsamples by 2, 4 or 8 before the pitch analysis, see `decimator.PolyphaseDecimator`.
+    With an `analysis_pool` the hops are analysed by that shared `analysis_pool.AnalysisPool` instead of a
+    dedicated worker, hops older than `analysis_deadline` seconds are dropped when newer ones wait.
+    With a `recorder` (see `session_recorder.SessionRecorder`) every channel records its samples and hops.
+    """
+    def __init__(self, device_name, sample_rate, buffer_size, pitch_tolerance, min_confidence, use_pitch_worker=False,
+                 num_channels=1, pitch_backend="aubio", capture_source="sdl", realtime=True, buf_size=4096,
+                 calibrate_latency=False, clock=time.perf_counter, auto_range=True, voice_gate=True,
+                 decimation=1, analysis_pool=None, analysis_deadline=None, recorder=None):
         self.device_name = device_name
+        self.clock = clock
         self.min_confidence = min_confidence
+        self.num_channels = num_channels
 
-        self.pitch_detector = PitchDetector(buffer_size, sample_rate, pitch_tolerance)
-        self.pitch = multiprocessing.Value(ctypes.c_double)
-        self.confidence = multiprocessing.Value(ctypes.c_double)
+        if calibrate_latency:
+            settings = latency_calibration.calibrate(
+                device_name, sample_rate, num_channels, capture_source, pitch_backend)
+            buffer_size = settings["buffer_size"]
+            buf_size = settings["buf_size"]
+        self.buffer_size = buffer_size
+        self.buf_size = buf_size
 
-        # min and max pitches are adjusted by input.
-        self.min_pitch = 40.0
-        self.max_pitch = 60.0
-
-        self.pitch_cache_list = llist.dllist()
-        self.cache_size_limit = 3
-
-        def callback(audio_device, audio_memory_view):
-            sound_chunk = bytes(audio_memory_view)
-            signal = np.frombuffer(sound_chunk, dtype=np.float32)
-
-            pitch, confidence = self.pitch_detector.get_pitch_confidence_tuple(signal)
-            self.pitch.value = pitch
-            self.confidence.value = confidence
-
-        # Set up audio device
-        self.audio_device = AudioDevice(
-            devicename=device_name,
-            iscapture=True,
-            frequency=sample_rate,
-            audioformat=AUDIO_F32,
-            numchannels=1,
-            chunksize=buffer_size,
-            allowed_changes=AUDIO_ALLOW_FORMAT_CHANGE,
-            callback=callback,
-        )
-
-        # Pause playback
-        self.audio_device.pause(0)
-
-    def get_normalized_position(self) -> float:
-        raw_pitch = self.pitch.value
-        raw_confidence = self.confidence.value
-
-        if raw_pitch <= 0:
-            pass
-
-        elif raw_pitch < 20:
-            # Too small, ignore
-            # print("Pitch too low")
-            pass
-
-        elif raw_pitch > 90:
-            # Too high, ignore
-            # print("Pitch too high")
-            pass
-
-        elif raw_confidence < self.min_confidence:
-            # print("Low confidence")
-            pass
+        if analysis_pool is not None or use_pitch_worker:
+            # Chunks go to a separate process through shared memory, results come back the same way
+            if analysis_pool is not None:
+                self.pitch_worker = analysis_pool.add_source(
+                    buffer_size, sample_rate, pitch_tolerance, num_channels, pitch_backend, buf_size, voice_gate,
+                    decimation, analysis_deadline)
+            else:
+                self.pitch_worker = PitchWorker(
+                    buffer_size, sample_rate, pitch_tolerance, num_channels, pitch_backend, buf_size, voice_gate,
+                    decimation)
+            self.pitch_detector = None
+            self.sample_ring = None
+            self.pitch_rings = self.pitch_worker.pitch_rings
+        else:
+            # The callback fills the sample ring and publishes one record per hop and channel, the game loop drains them
+            self.pitch_worker = None
+            self.pitch_detector = PitchDetector(
+                buffer_size, sample_rate, pitch_tolerance, num_channels, pitch_backend, buf_size=buf_size,
+                voice_gate=voice_gate, decimation=decimation)
+            self.sample_ring = SampleRing(buffer_size, num_channels=num_channels)
+            self.pitch_rings = [PitchRing() for _ in range(num_channels)]
+        self.hop_index = 0
+        self.recorder = recorder
 
+        # Hops are timestamped when they arrive, the pitch describes the middle of the analysis window
+        analysis_delay = (buf_size / 2 + decimator_delay(decimation)) / sample_rate
+        if num_channels == 1:
+            channel_names = [device_name]
         else:
-            self.pitch_cache_list.appendleft(raw_pitch)
-            if self.pitch_cache_list.size >= self.cache_size_limit:
-                self.pitch_cache_list.popright()
+            channel_names = [f"{device_name} #{channel + 1}" for channel in range(num_channels)]
+        self.recordings = [
+            recorder.add_player(name, sample_rate, buffer_size) if recorder is not None else None
+            for name in channel_names
+        ]
+        self.channels = [
+            MicChannel(name, min_confidence, pitch_ring, analysis_delay=analysis_delay, auto_range=auto_range,
+                       recording=recording)
+            for name, pitch_ring, recording in zip(channel_names, self.pitch_rings, self.recordings)
+        ]
+        self.telemetry = MicTelemetry(
+            device_name, buffer_size / sample_rate, [channel.telemetry for channel in self.channels])
 
-        if self.pitch_cache_list.size == 0:
-            return -1
+        def callback(capture_source, audio_memory_view):
+            # View on the device buffer, copied once into the sample ring
+            self.process_chunk(np.frombuffer(audio_memory_view, dtype=np.float32))
+
+        # Set up audio device, or a file/synthetic source that pushes through the same callback
+        try:
+            self.capture_source = make_capture_source(
+                capture_source, device_name, sample_rate, buffer_size, num_channels, callback, realtime)
+        except Exception:
+            if self.pitch_worker is not None and analysis_pool is None:
+                self.pitch_worker.close()
+            raise
+
+    def start(self):
+        if self.pitch_worker is not None:
+            self.pitch_worker.start()
+
+        # Unpause capture
+        self.capture_source.pause(0)
+
+    def stop(self):
+        self.capture_source.pause(1)
+
+        if self.pitch_worker is not None:
+            self.pitch_worker.stop()
+
+    def close(self):
+        self.stop()
+        self.capture_source.close()
+
+        if self.pitch_worker is not None:
+            # Drop our views on the shared memory before it is released
+            self.pitch_rings = None
+            self.channels = None
+            self.pitch_worker.close()
+
+    def process_chunk(self, samples):
+        start = time.perf_counter()
+        timestamp = self.clock()
+        if self.recorder is not None:
+            # Interleaved, every channel keeps its own samples
+            for channel, recording in enumerate(self.recordings):
+                recording.add_samples(samples[channel::self.num_channels])
+        if self.pitch_worker is not None:
+            self.pitch_worker.submit(samples, timestamp)
+            self.telemetry.worker_backlog.add(self.pitch_worker.backlog)
+            self.telemetry.record_callback(start, time.perf_counter())
+            return
+
+        # Deinterleaved into one row per channel, then all channels are analysed in one batch
+        signals = self.sample_ring.write(samples, timestamp)
+        analysis_start = time.perf_counter()
+        pitches, confidences = self.pitch_detector.get_pitch_confidence_batch(signals)
+        analysis_time = time.perf_counter() - analysis_start
+        rms = np.sqrt(np.einsum("ij,ij->i", signals, signals) / signals.shape[1])
 
-        avg_raw_pitch = sum(self.pitch_cache_list) / self.pitch_cache_list.size
-        norm_pitch = (avg_raw_pitch - self.min_pitch) / (self.max_pitch - self.min_pitch)
+        for channel, pitch_ring in enumerate(self.pitch_rings):
+            pitch_ring.push(timestamp, pitches[channel], confidences[channel], rms[channel], self.hop_index,
+                            analysis_time, self.pitch_detector.voiced[channel])
+        self.hop_index += 1
+        self.telemetry.record_callback(start, time.perf_counter())
 
-        clipped_norm_pitch = np.clip(norm_pitch, 0, 1)
-        print(f"[{self.device_name}] raw pitch: {raw_pitch}, normalized mean pitch: {norm_pitch}, clipped pitch: {clipped_norm_pitch}")
+    def get_telemetry(self) -> dict:
+        """
+        Snapshot of the device and channel counters, see `telemetry.MicTelemetry`
+        """
+        if self.channels is None:
+            return self.telemetry.snapshot()
+        return self.telemetry.snapshot([channel.pitch_ring.dropped for channel in self.channels])
 
-        return clipped_norm_pitch
+    def get_normalized_position(self, present_time=None) -> float:
+        return self.channels[0].get_normalized_position(present_time)
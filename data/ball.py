@@ -2,6 +2,13 @@ import pygame as pg
 import random
 from . import tools
 
+# Events listed in Ball.events, the owner plays the sounds
+BOUNCE = "bounce"
+GUTTER = "gutter"
+
+# A ball in a corner bounces twice in a step, the limit only guards against numerical ping-pong
+MAX_BOUNCES_PER_STEP = 4
+
 
 class Ball:
     def __init__(self,
@@ -9,9 +16,10 @@ class Ball:
                  width,
                  height,
                  color=(255, 255, 255),
-                 menu=False,
-                 speed=3):
-        self.menu = menu
+                 speed=3,
+                 rng=None):
+        # A seeded random.Random makes serves reproducible
+        self.random = rng or random
         self.width = width
         self.height = height
         self.screen_rect = screen_rect
@@ -20,24 +28,21 @@ class Ball:
         self.center_screen = screen_rect.center
         self.color = color
         self.surface.fill(self.color)
+        # Rect drawn between the previous and the current simulated position
+        self.draw_rect = self.rect.copy()
+        # Pixels per frame at tools.REFERENCE_FPS
         self.speed_init = speed
         self.speed = self.speed_init
         self.speed_incr = 0
         self.switch_speed = 5
+        # Collisions since the owner last cleared the list
+        self.events = []
         self.set_ball()
-        self.sound_init()
-        self.moving_away_from_AI = False
-
-    def sound_init(self):
-        self.bounce = tools.Sound('boing.wav')
-        self.bounce.sound.set_volume(.5)
-        self.gutter = tools.Sound('whoosh.wav')
-        self.gutter.sound.set_volume(.1)
 
     def get_random_float(self):
         '''get float for velocity of ball on starting direction'''
         while True:
-            num = random.uniform(-1.0, 1.0)
+            num = self.random.uniform(-1.0, 1.0)
             if num > -.5 and num < .5:
                 continue
             else:
@@ -46,65 +51,128 @@ class Ball:
     def set_ball(self):
         x = self.get_random_float()
         y = self.get_random_float()
-        if x < 0:
-            self.moving_away_from_AI = False
         self.vel = [x, y]
         self.rect.center = self.center_screen
         self.true_pos = list(self.rect.center)
+        # A reset jumps, it is not interpolated
+        self.previous_pos = list(self.true_pos)
 
         self.speed = self.speed_init  #reset speed
         self.speed_incr = 0
 
-    def collide_walls(self):
+    def collide_gutters(self):
         if self.rect.x < 0:
-            if not self.menu:
-                self.gutter.sound.play()
-                self.set_ball()
-                return -1
+            self.events.append(GUTTER)
+            self.set_ball()
+            return -1
         elif self.rect.x > self.screen_rect.right:
-            if not self.menu:
-                self.gutter.sound.play()
-                self.set_ball()
-                return 1
-
-        if self.rect.y < 0 or self.rect.y > self.screen_rect.bottom - self.height:
-            if not self.menu:
-                self.bounce.sound.play()
-            self.vel[1] *= -1
-
-        if self.menu:
-            if self.rect.x < 0 or self.rect.x > self.screen_rect.right - self.height:
-                self.vel[0] *= -1
+            self.events.append(GUTTER)
+            self.set_ball()
+            return 1
         return 0
 
-    def collide_paddle(self, paddle_left_rect, paddle_right_rect):
-        if self.rect.colliderect(paddle_left_rect):
-            if not self.menu:
-                self.bounce.sound.play()
-            self.moving_away_from_AI = True
-            self.vel[0] *= -1
-            self.speed_incr += 1
-        elif self.rect.colliderect(paddle_right_rect):
-            if not self.menu:
-                self.bounce.sound.play()
-            self.moving_away_from_AI = False
-            self.vel[0] *= -1
-            self.speed_incr += 1
-
-    def move(self):
-        self.true_pos[0] += self.vel[0] * self.speed
-        self.true_pos[1] += self.vel[1] * self.speed
+    def time_of_impact(self, dx, dy, rect):
+        """
+        Swept AABB test of this ball moving by (dx, dy) against the static `rect`: the fraction of the move
+        at which they first touch and the axis (0 for x, 1 for y) of the face that was hit, or None.
+        A ball that already overlaps `rect` and moves further in hits it at once.
+        """
+        left = self.true_pos[0] - self.width / 2
+        top = self.true_pos[1] - self.height / 2
+        entry = [0.0, 0.0]
+        exit = [0.0, 0.0]
+        for axis, (low, size, delta, rect_low, rect_size) in enumerate(
+                ((left, self.width, dx, rect.left, rect.width), (top, self.height, dy, rect.top, rect.height))):
+            if delta > 0:
+                entry[axis] = (rect_low - (low + size)) / delta
+                exit[axis] = (rect_low + rect_size - low) / delta
+            elif delta < 0:
+                entry[axis] = (rect_low + rect_size - low) / delta
+                exit[axis] = (rect_low - (low + size)) / delta
+            elif low + size > rect_low and low < rect_low + rect_size:
+                entry[axis] = float("-inf")
+                exit[axis] = float("inf")
+            else:
+                return None
+
+        axis = 0 if entry[0] >= entry[1] else 1
+        time = entry[axis]
+        if time > min(exit) or time >= 1.0 or min(exit) <= 0.0:
+            return None
+        if time < 0.0:
+            # Overlapping already, e.g. a paddle moved onto the ball. It bounces back once if it is heading
+            # further in, and is let go otherwise instead of flipping back and forth inside.
+            if (self.true_pos[0] - rect.centerx) * dx >= 0:
+                return None
+            return 0.0, 0
+        return time, axis
+
+    def wall_impact(self, dy):
+        # Only a ball moving towards a wall can hit it, one that is already beyond it just turns around
+        top = self.true_pos[1] - self.height / 2
+        if dy < 0:
+            time = (self.screen_rect.top - top) / dy
+        elif dy > 0:
+            time = (self.screen_rect.bottom - (top + self.height)) / dy
+        else:
+            return None
+        if time >= 1.0:
+            return None
+        return max(time, 0.0)
+
+    def move(self, paddle_left_rect, paddle_right_rect, time_delta):
+        """
+        Move by one step and bounce off the walls and paddles at the exact moment of contact, however
+        far the ball travels in the step: fast balls cannot tunnel through a paddle or stick inside it.
+        """
+        self.previous_pos[:] = self.true_pos
+        distance = self.speed * tools.REFERENCE_FPS * time_delta
+        remaining = 1.0
+        for _ in range(MAX_BOUNCES_PER_STEP):
+            dx = self.vel[0] * distance * remaining
+            dy = self.vel[1] * distance * remaining
+
+            # Earliest contact along this move, as (fraction of the move, axis, paddle side or 0 for a wall)
+            hit = None
+            wall_time = self.wall_impact(dy)
+            if wall_time is not None:
+                hit = (wall_time, 1, 0)
+            for side, rect in ((-1, paddle_left_rect), (1, paddle_right_rect)):
+                impact = self.time_of_impact(dx, dy, rect)
+                if impact is not None and (hit is None or impact[0] < hit[0]):
+                    hit = (impact[0], impact[1], side)
+
+            if hit is None:
+                self.true_pos[0] += dx
+                self.true_pos[1] += dy
+                break
+
+            time, axis, side = hit
+            self.true_pos[0] += dx * time
+            self.true_pos[1] += dy * time
+            remaining *= 1.0 - time
+            self.vel[axis] *= -1
+            self.events.append(BOUNCE)
+            if side and axis == 0:
+                self.speed_incr += 1
         self.rect.center = self.true_pos
 
-    def update(self, paddle_left_rect, paddle_right_rect):
-        hit_side = self.collide_walls()
+    def update(self, paddle_left_rect, paddle_right_rect, time_delta):
+        hit_side = self.collide_gutters()
         if hit_side:
             return hit_side
-        self.move()
-        self.collide_paddle(paddle_left_rect, paddle_right_rect)
+        self.move(paddle_left_rect, paddle_right_rect, time_delta)
         if self.speed_incr >= self.switch_speed:
             self.speed += 1
             self.speed_incr = 0
 
-    def render(self, screen):
-        screen.blit(self.surface, self.rect)
+    def interpolated_rect(self, interpolation=1.0):
+        '''rect between the previous and the current simulated position, reused across calls'''
+        self.draw_rect.center = (
+            self.previous_pos[0] + (self.true_pos[0] - self.previous_pos[0]) * interpolation,
+            self.previous_pos[1] + (self.true_pos[1] - self.previous_pos[1]) * interpolation,
+        )
+        return self.draw_rect
+
+    def render(self, screen, interpolation=1.0):
+        screen.blit(self.surface, self.interpolated_rect(interpolation))
@@ -0,0 +1,165 @@
+import numpy as np
+import pygame as pg
+from . import tools
+from .spatial_hash import SpatialHash
+
+# Decorative balls pick their color from this many pre-built surfaces
+PALETTE_SIZE = 32
+
+
+class BallSystem:
+    """
+    Many decorative balls that bounce off the four walls, stored as NumPy arrays of centers, directions
+    and speeds instead of one Ball object each, so a step costs a few array operations however many balls
+    there are. All balls share the surfaces of one color palette and are drawn with a single Surface.blits.
+
+    Holds at most `max_balls`, adding more replaces the oldest. Balls bounce off the rects passed to
+    `step`, and off each other as equal masses with `collide_balls`. Both find their candidates through
+    a spatial hash, which keeps the cost roughly linear in the number of balls.
+    """
+    def __init__(self, screen_rect, size=10, max_balls=512, rng=None, collide_balls=False):
+        self.screen_rect = pg.Rect(screen_rect)
+        self.size = size
+        self.max_balls = max_balls
+        self.collide_balls = collide_balls
+        self.spatial_hash = SpatialHash(self.screen_rect, 2 * size)
+        # A seeded np.random.Generator makes colors, speeds and directions reproducible
+        self.random = rng if rng is not None else np.random.default_rng()
+
+        self.pos = np.zeros((max_balls, 2))
+        self.previous_pos = np.zeros((max_balls, 2))
+        self.vel = np.zeros((max_balls, 2))
+        # Pixels per frame at tools.REFERENCE_FPS
+        self.speed = np.zeros(max_balls)
+        self.color_index = np.zeros(max_balls, dtype=np.intp)
+        self.count = 0
+        self.added = 0
+
+        self.palette = []
+        for color in self.random.integers(0, 256, (PALETTE_SIZE, 3)):
+            surface = pg.Surface([size, size])
+            surface.fill(tuple(int(c) for c in color))
+            self.palette.append(surface)
+        # Reused by sprites(), one per slot
+        self.rects = [pg.Rect(0, 0, size, size) for _ in range(max_balls)]
+
+        # Ball centers stay within these bounds, the edges of the ball touch the walls
+        half = size / 2
+        self.min_pos = np.array([self.screen_rect.left + half, self.screen_rect.top + half])
+        self.max_pos = np.array([self.screen_rect.right - half, self.screen_rect.bottom - half])
+
+    def __len__(self):
+        return self.count
+
+    def random_directions(self, count):
+        # Like Ball.get_random_float: every component between 0.5 and 1 in either direction
+        magnitude = self.random.uniform(0.5, 1.0, (count, 2))
+        sign = self.random.choice([-1.0, 1.0], (count, 2))
+        return magnitude * sign
+
+    def add(self, count, speed_range=(3, 8), center=None):
+        """
+        Serve `count` balls from `center` (default: the middle of the screen) in random directions,
+        with random colors and integer speeds in `speed_range`, both ends included
+        """
+        count = min(count, self.max_balls)
+        slots = (self.added + np.arange(count)) % self.max_balls
+        self.added += count
+        self.count = min(self.added, self.max_balls)
+
+        self.pos[slots] = center if center is not None else self.screen_rect.center
+        self.previous_pos[slots] = self.pos[slots]
+        self.vel[slots] = self.random_directions(count)
+        self.speed[slots] = self.random.integers(speed_range[0], speed_range[1] + 1, count)
+        self.color_index[slots] = self.random.integers(0, PALETTE_SIZE, count)
+
+    def clear(self):
+        self.count = 0
+        self.added = 0
+
+    def step(self, time_delta, rects=()):
+        """
+        Move every ball by `time_delta` seconds and bounce it off the walls, the `rects` (e.g. paddles)
+        and, with `collide_balls`, the other balls
+        """
+        n = self.count
+        pos = self.pos[:n]
+        vel = self.vel[:n]
+        self.previous_pos[:n] = pos
+        pos += vel * (self.speed[:n, None] * tools.REFERENCE_FPS * time_delta)
+
+        # Reflect off the walls: point the direction away from the wall and keep the ball inside
+        low = pos < self.min_pos
+        high = pos > self.max_pos
+        np.copyto(vel, np.abs(vel), where=low)
+        np.copyto(vel, -np.abs(vel), where=high)
+        np.clip(pos, self.min_pos, self.max_pos, out=pos)
+
+        if not rects and not self.collide_balls:
+            return
+        self.spatial_hash.rebuild(pos)
+        for rect in rects:
+            self.collide_rect(rect)
+        if self.collide_balls:
+            self.collide_pairs()
+
+    def collide_rect(self, rect):
+        # Sent back horizontally, away from the middle of the rect, and moved out of it
+        candidates = self.spatial_hash.query(rect)
+        offset = self.pos[candidates] - rect.center
+        touching = ((np.abs(offset[:, 0]) < (rect.width + self.size) / 2) &
+                    (np.abs(offset[:, 1]) < (rect.height + self.size) / 2))
+        hit = candidates[touching]
+        side = np.where(offset[touching, 0] < 0, -1.0, 1.0)
+        self.vel[hit, 0] = np.abs(self.vel[hit, 0]) * side
+        self.pos[hit, 0] = rect.centerx + side * (rect.width + self.size) / 2
+
+    def collide_pairs(self):
+        first, second = self.spatial_hash.pairs()
+        offset = self.pos[first] - self.pos[second]
+        touching = (np.abs(offset) < self.size).all(axis=1)
+        first, second, offset = first[touching], second[touching], offset[touching]
+        distance = np.hypot(offset[:, 0], offset[:, 1])
+        apart = distance > 0
+        first, second = first[apart], second[apart]
+        normal = offset[apart] / distance[apart, None]
+
+        # Equal masses swap the parts of their velocities along the line between them, if they approach
+        speed = self.speed[:, None]
+        approach = ((self.vel[first] * speed[first] - self.vel[second] * speed[second]) * normal).sum(axis=1)
+        closing = approach < 0
+        first, second = first[closing], second[closing]
+        impulse = approach[closing, None] * normal[closing]
+
+        # A ball takes part in one collision per step, the next step resolves the rest of a cluster.
+        # Summing several impulses computed from the same velocities would add energy.
+        balls = np.concatenate([first, second])
+        earliest = np.zeros(len(balls), dtype=bool)
+        earliest[np.unique(balls, return_index=True)[1]] = True
+        single = earliest[:len(first)] & earliest[len(first):]
+        first, second, impulse = first[single], second[single], impulse[single]
+        self.vel[first] -= impulse / speed[first]
+        self.vel[second] += impulse / speed[second]
+
+    def topleft(self, interpolation=1.0):
+        """(count, 2) integer top left corners between the previous and the current step"""
+        n = self.count
+        pos = self.previous_pos[:n] + (self.pos[:n] - self.previous_pos[:n]) * interpolation
+        return np.rint(pos - self.size / 2).astype(np.intp)
+
+    def draw(self, screen, interpolation=1.0):
+        palette = self.palette
+        screen.blits(
+            [(palette[c], xy) for c, xy in zip(self.color_index[:self.count].tolist(),
+                                                self.topleft(interpolation).tolist())],
+            doreturn=False)
+
+    def sprites(self, interpolation=1.0):
+        """(surface, rect) pairs for tools.States.render_sprites"""
+        sprites = []
+        palette = self.palette
+        for rect, c, xy in zip(self.rects, self.color_index[:self.count].tolist(),
+                               self.topleft(interpolation).tolist()):
+            rect.topleft = xy
+            sprites.append((palette[c], rect))
+        return sprites
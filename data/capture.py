@@ -0,0 +1,261 @@
+from pygame._sdl2 import (
+    AudioDevice,
+    AUDIO_F32,
+    AUDIO_ALLOW_FORMAT_CHANGE,
+)
+import numpy as np
+import os
+import threading
+import time
+import wave
+from .session_recorder import read_log, SAMPLES_SUFFIX
+
+SYNTHETIC_KINDS = ["sine", "glide", "vibrato", "noise"]
+
+
+class SDLCaptureSource(object):
+    """
+    Capture from a real input device through SDL
+    """
+    def __init__(self, device_name, sample_rate, chunk_size, num_channels, callback):
+        self.device_name = device_name
+        self.sample_rate = sample_rate
+        self.chunk_size = chunk_size
+        self.num_channels = num_channels
+        self.audio_device = AudioDevice(
+            devicename=device_name,
+            iscapture=True,
+            frequency=sample_rate,
+            audioformat=AUDIO_F32,
+            numchannels=num_channels,
+            chunksize=chunk_size,
+            allowed_changes=AUDIO_ALLOW_FORMAT_CHANGE,
+            callback=callback,
+        )
+
+    def pause(self, paused):
+        self.audio_device.pause(paused)
+
+    def close(self):
+        self.audio_device.close()
+
+
+class ArrayCaptureSource(object):
+    """
+    Plays a prerecorded (num_frames, num_channels) float32 signal through a capture callback.
+
+    Chunks are handed to `callback(source, memoryview)` exactly like SDL does. After `pause(0)` a
+    background thread pushes them at realtime pace, or as fast as possible if `realtime` is False.
+    `push_next` and `run` push chunks synchronously from the calling thread instead.
+    """
+    def __init__(self, signal, sample_rate, chunk_size, num_channels, callback, realtime=True, loop=True):
+        self.sample_rate = sample_rate
+        self.chunk_size = chunk_size
+        self.num_channels = num_channels
+        self.callback = callback
+        self.realtime = realtime
+        self.loop = loop
+
+        # Match the requested channel count: duplicate mono, drop surplus channels
+        signal = np.asarray(signal, dtype=np.float32)
+        if signal.ndim == 1:
+            signal = signal[:, np.newaxis]
+        if signal.shape[1] < num_channels:
+            signal = np.repeat(signal[:, :1], num_channels, axis=1)
+        self.signal = np.ascontiguousarray(signal[:, :num_channels])
+        self.num_frames = len(self.signal)
+
+        # Interleaved chunk handed to the callback, reused for every push
+        self.chunk = np.zeros(chunk_size * num_channels, dtype=np.float32)
+        self.chunk_frames = self.chunk.reshape(chunk_size, num_channels)
+        self.chunk_view = memoryview(self.chunk).cast("B")
+        self.position = 0
+        self.chunks_pushed = 0
+
+        self.running = threading.Event()
+        self.closed = False
+        self.thread = None
+
+    @property
+    def duration(self) -> float:
+        return self.num_frames / self.sample_rate
+
+    def push_next(self) -> bool:
+        """
+        Push one chunk through the callback. Returns False once the signal is exhausted.
+        """
+        if self.position >= self.num_frames:
+            if not self.loop or self.num_frames == 0:
+                return False
+            self.position = 0
+
+        end = min(self.position + self.chunk_size, self.num_frames)
+        count = end - self.position
+        self.chunk_frames[:count] = self.signal[self.position:end]
+        self.chunk_frames[count:] = 0
+        self.position = end
+
+        self.callback(self, self.chunk_view)
+        self.chunks_pushed += 1
+        return True
+
+    def run(self, max_chunks=None) -> int:
+        """
+        Push chunks synchronously as fast as possible, returns the number of chunks pushed
+        """
+        pushed = 0
+        while max_chunks is None or pushed < max_chunks:
+            if not self.push_next():
+                break
+            pushed += 1
+        return pushed
+
+    def _thread_main(self):
+        period = self.chunk_size / self.sample_rate
+        next_time = time.perf_counter()
+        while not self.closed:
+            if not self.running.wait(timeout=0.1):
+                next_time = time.perf_counter()
+                continue
+            if not self.push_next():
+                break
+            if self.realtime:
+                next_time += period
+                delay = next_time - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+
+    def pause(self, paused):
+        if paused:
+            self.running.clear()
+            return
+
+        self.running.set()
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._thread_main, daemon=True)
+            self.thread.start()
+
+    def close(self):
+        self.closed = True
+        self.running.clear()
+        if self.thread is not None:
+            self.thread.join(timeout=1.0)
+            self.thread = None
+
+
+def load_audio_file(path, sample_rate) -> np.ndarray:
+    """
+    Load a PCM WAV file, a NumPy .npy array or a recorded player's .samples file as (num_frames, num_channels)
+    float32 at `sample_rate`. .npy and .samples files are expected to be sampled at `sample_rate` already.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".npy":
+        return np.load(path).astype(np.float32)
+    if extension == SAMPLES_SUFFIX:
+        return np.array(read_log(path, np.float32)).reshape(-1, 1)
+
+    with wave.open(path, "rb") as wav:
+        num_channels = wav.getnchannels()
+        sample_width = wav.getsampwidth()
+        file_rate = wav.getframerate()
+        raw = wav.readframes(wav.getnframes())
+
+    if sample_width == 1:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif sample_width == 2:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 2 ** 15
+    elif sample_width == 3:
+        # Sign extend 24 bit little endian samples into int32
+        triples = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        ints = (triples[:, 0] << 8) | (triples[:, 1] << 16) | (triples[:, 2] << 24)
+        samples = (ints >> 8).astype(np.float32) / 2 ** 23
+    else:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2 ** 31
+    signal = samples.reshape(-1, num_channels)
+
+    if file_rate != sample_rate:
+        # Linear interpolation is plenty for pitch tracking
+        num_frames = int(round(len(signal) * sample_rate / file_rate))
+        source_times = np.arange(len(signal)) / file_rate
+        target_times = np.arange(num_frames) / sample_rate
+        signal = np.stack([np.interp(target_times, source_times, signal[:, c]) for c in range(num_channels)], axis=1)
+
+    return signal.astype(np.float32)
+
+
+def midi_to_hz(midi):
+    return 440.0 * 2 ** ((np.asarray(midi) - 69) / 12)
+
+
+def make_synthetic_signal(kind, sample_rate, duration=10.0, midi=50.0, midi_end=None, vibrato_depth=0.5,
+                          vibrato_rate=5.5, amplitude=0.3, noise_level=0.0, seed=None):
+    """
+    Build a test signal and its ground truth pitch in MIDI per sample (NaN where no pitch is present).
+
+    sine: constant `midi`; glide: linear sweep from `midi` to `midi_end` and back;
+    vibrato: `midi` modulated by +-`vibrato_depth` semitones; noise: white noise only.
+    """
+    if kind not in SYNTHETIC_KINDS:
+        raise ValueError(f"Unknown synthetic signal {kind}, expected one of {SYNTHETIC_KINDS}")
+
+    rng = np.random.default_rng(seed)
+    num_frames = int(duration * sample_rate)
+    t = np.arange(num_frames) / sample_rate
+
+    if kind == "noise":
+        signal = amplitude * rng.standard_normal(num_frames)
+        return signal.astype(np.float32), np.full(num_frames, np.nan)
+
+    if kind == "sine":
+        pitch = np.full(num_frames, float(midi))
+    elif kind == "glide":
+        midi_end = midi + 12 if midi_end is None else midi_end
+        triangle = 1 - np.abs(2 * t / duration - 1)
+        pitch = midi + (midi_end - midi) * triangle
+    else:
+        pitch = midi + vibrato_depth * np.sin(2 * np.pi * vibrato_rate * t)
+
+    # Integrate the instantaneous frequency so sweeps stay phase continuous
+    phase = 2 * np.pi * np.cumsum(midi_to_hz(pitch)) / sample_rate
+    signal = amplitude * (np.sin(phase) + 0.3 * np.sin(2 * phase) + 0.1 * np.sin(3 * phase)) / 1.4
+    if noise_level > 0:
+        signal += noise_level * rng.standard_normal(num_frames)
+
+    return signal.astype(np.float32), pitch
+
+
+class FileCaptureSource(ArrayCaptureSource):
+    """
+    Replay a recorded session from a WAV or .npy file
+    """
+    def __init__(self, path, sample_rate, chunk_size, num_channels, callback, realtime=True, loop=True):
+        self.path = path
+        ArrayCaptureSource.__init__(
+            self, load_audio_file(path, sample_rate), sample_rate, chunk_size, num_channels, callback, realtime, loop)
+
+
+class SyntheticCaptureSource(ArrayCaptureSource):
+    """
+    Generated sine, glide, vibrato or noise signal with known ground truth pitch
+    """
+    def __init__(self, kind, sample_rate, chunk_size, num_channels, callback, realtime=True, loop=True, **signal_settings):
+        self.kind = kind
+        signal, self.ground_truth = make_synthetic_signal(kind, sample_rate, **signal_settings)
+        ArrayCaptureSource.__init__(self, signal, sample_rate, chunk_size, num_channels, callback, realtime, loop)
+
+
+def make_capture_source(source, device_name, sample_rate, chunk_size, num_channels, callback, realtime=True):
+    """
+    Create a capture source from its description:
+    "sdl" opens `device_name`, "file:<path>" replays a recording, "synthetic:<kind>" generates a test signal.
+    """
+    if source == "sdl":
+        return SDLCaptureSource(device_name, sample_rate, chunk_size, num_channels, callback)
+
+    kind, _, argument = source.partition(":")
+    if kind == "file":
+        return FileCaptureSource(argument, sample_rate, chunk_size, num_channels, callback, realtime)
+    if kind == "synthetic":
+        return SyntheticCaptureSource(argument or "glide", sample_rate, chunk_size, num_channels, callback, realtime)
+
+    raise ValueError(f"Unknown capture source {source}, expected sdl, file:<path> or synthetic:<kind>")
@@ -1,10 +1,66 @@
 import os
+import threading
 import pygame as pg
-from .states import classic, menu, mode, options, controls, audio, ghost, splash, keybinding, getkey
+from . import tools
+from .states import classic, menu, mode, options, controls, audio, ghost, splash, keybinding, getkey, range_calibration
+
+# Game physics run at a fixed rate, independent of how fast frames are rendered
+PHYSICS_RATE = 240
+# Longer frames, e.g. while the window is dragged, are cut short instead of simulating a burst of steps
+MAX_FRAME_TIME = 0.25
+# Errors of building a state that leave the game running, e.g. a missing microphone. SDL's audio device
+# errors (pygame._sdl2.sdl2.error) derive from RuntimeError, not from pg.error.
+STATE_ERRORS = (pg.error, RuntimeError, OSError, ValueError)
+
+
+class StateRegistry(object):
+    '''
+    Builds every state the first time it is asked for. Each name has its own lock, so a state being built
+    by the warm-up thread is waited for instead of built twice, while other states stay available.
+    '''
+    def __init__(self, factories):
+        self.factories = factories
+        self.locks = {name: threading.Lock() for name in factories}
+        self.states = {}
+
+    def get(self, name):
+        with self.locks[name]:
+            state = self.states.get(name)
+            if state is None:
+                state = self.states[name] = self.factories[name]()
+            return state
+
+    def values(self):
+        return list(self.states.values())
+
+
+class WarmUp(threading.Thread):
+    '''
+    Runs (description, function) steps in the background, e.g. while the splash screen shows.
+    A failing step is reported and skipped, whatever it prepares is then built on first use instead.
+    '''
+    def __init__(self, steps):
+        threading.Thread.__init__(self, daemon=True)
+        self.steps = steps
+        self.status = ''
+        self.progress = 0.0
+        self.errors = []
+
+    def run(self):
+        for i, (description, function) in enumerate(self.steps):
+            self.status = description
+            try:
+                function()
+            except STATE_ERRORS as e:
+                print('{} failed: {}'.format(description, e))
+                self.errors.append((description, e))
+            self.progress = (i + 1) / len(self.steps)
+        self.status = 'Ready'
 
 
 class Control(object):
-    def __init__(self, fullscreen, difficulty, size, audio_device_name_1, audio_device_name_2):
+    def __init__(self, fullscreen, difficulty, size, audio_device_name_1, audio_device_name_2, audio_settings=None,
+                 fps=60, dirty_rects=False):
         sample_rate = 44100
         buffer_size = 1024
         pg.mixer.pre_init(frequency=sample_rate, size=-16, channels=1, buffer=buffer_size)
@@ -20,23 +76,44 @@ class Control(object):
 
         self.screen_rect = self.screen.get_rect()
         self.clock = pg.time.Clock()
-        self.fps = 60
+        self.fps = fps
+        self.step_duration = 1.0 / PHYSICS_RATE
         self.keys = pg.key.get_pressed()
         self.done = False
-        self.state_dict = {
-            "MENU": menu.Menu(self.screen_rect),
-            "CLASSIC": classic.Classic(self.screen_rect, difficulty, audio_device_name_1, audio_device_name_2),
-            # "CONTROLS": controls.Controls(self.screen_rect),
-            "MODE": mode.Mode(self.screen_rect),
-            # "OPTIONS": options.Options(self.screen_rect),
-            # "AUDIO": audio.Audio(self.screen_rect),
-            # "BALLS": ghost.Ghost(self.screen_rect, difficulty),
-            "SPLASH": splash.Splash(self.screen_rect),
-            "KEYBINDING": keybinding.KeyBinding(self.screen_rect),
-            "GETKEY": getkey.GetKey(self.screen_rect)
-        }
+        # Push only the regions states report as changed instead of the whole framebuffer
+        self.dirty_rects = dirty_rects
+
+        # States are built on first entry, only the splash screen is needed for the first frame
+        self.states = StateRegistry({
+            "MENU": lambda: menu.Menu(self.screen_rect),
+            "CLASSIC": lambda: classic.Classic(self.screen_rect, difficulty, audio_device_name_1, audio_device_name_2, audio_settings),
+            "CALIBRATE": lambda: range_calibration.RangeCalibration(self.screen_rect, self.states.get("CLASSIC")),
+            # "CONTROLS": lambda: controls.Controls(self.screen_rect),
+            "MODE": lambda: mode.Mode(self.screen_rect),
+            # "OPTIONS": lambda: options.Options(self.screen_rect),
+            # "AUDIO": lambda: audio.Audio(self.screen_rect),
+            "BALLS": lambda: ghost.Ghost(self.screen_rect, difficulty, self.states.get("CLASSIC")),
+            "SPLASH": lambda: splash.Splash(self.screen_rect),
+            "KEYBINDING": lambda: keybinding.KeyBinding(self.screen_rect),
+            "GETKEY": lambda: getkey.GetKey(self.screen_rect)
+        })
+        self.state_dict = self.states.states
         self.state_name = "SPLASH"
-        self.state = self.state_dict[self.state_name]
+        self.state = self.get_state(self.state_name)
+
+        # Decode the assets, open the microphones and set up pitch detection while the splash screen shows
+        self.warm_up = WarmUp([
+            ("Loading sounds and fonts", tools.preload_assets),
+            ("Opening microphones", lambda: self.states.get("CLASSIC")),
+            ("Preparing the menu", lambda: self.states.get("MENU")),
+        ])
+        self.state.warm_up = self.warm_up
+        self.warm_up.start()
+
+    def get_state(self, name):
+        state = self.states.get(name)
+        state.use_dirty_rects = self.dirty_rects
+        return state
 
     def event_loop(self):
         for event in pg.event.get():
@@ -44,25 +121,53 @@ class Control(object):
                 self.quit = True
             elif event.type in (pg.KEYDOWN, pg.KEYUP):
                 self.keys = pg.key.get_pressed()
+            elif event.type in (pg.VIDEOEXPOSE, pg.WINDOWEXPOSED):
+                # The window system lost our pixels
+                self.state.invalidate()
             self.state.get_event(event, self.keys)
 
     def change_state(self):
         if self.state.done:
+            self.state.done = False
+            try:
+                next_state = self.get_state(self.state.next)
+            except STATE_ERRORS as e:
+                # e.g. a microphone is missing, stay where we are
+                print('Cannot open {}: {}'.format(self.state.next, e))
+                return
             self.state.cleanup()
             self.state_name = self.state.next
-            self.state.done = False
-            self.state = self.state_dict[self.state_name]
+            self.state = next_state
+            self.state.invalidate()
             self.state.entry()
 
     def run(self):
+        # Simulation time owed to the states, consumed in fixed steps
+        accumulator = 0.0
         while not self.done:
             if self.state.quit:
                 self.done = True
 
-            time_delta = float(self.clock.get_time()) / 1000
+            time_delta = min(float(self.clock.get_time()) / 1000, MAX_FRAME_TIME)
             self.event_loop()
             self.change_state()
             self.state.update(time_delta, self.keys)
+
+            accumulator += time_delta
+            while accumulator >= self.step_duration:
+                self.state.step(self.step_duration, self.keys)
+                accumulator -= self.step_duration
+            # Draw between the last two simulated states, the leftover time is simulated next frame
+            self.state.interpolation = accumulator / self.step_duration
+
             self.state.render(self.screen)
-            pg.display.update()
+            if self.dirty_rects and self.state.dirty_rects is not None:
+                pg.display.update(self.state.dirty_rects)
+            else:
+                pg.display.update()
             self.clock.tick(self.fps)
+
+        # A state still being built in the background is closed as well
+        self.warm_up.join()
+        for state in self.states.values():
+            state.close()
@@ -0,0 +1,67 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+DECIMATION_FACTORS = (1, 2, 4, 8)
+# Filter length per output sample, 16 taps with a Blackman window keep aliases into the pitch range below -70 dB
+TAPS_PER_PHASE = 16
+
+
+def design_lowpass(factor, taps_per_phase=TAPS_PER_PHASE) -> np.ndarray:
+    """
+    Blackman windowed sinc with its cutoff at the output Nyquist frequency and unity gain at DC.
+
+    The transition band reaches from 0.3 to 0.7 times the output sample rate. Everything that folds
+    back lands above 0.3 times the output rate, e.g. above 1650 Hz at 44.1 kHz / 8, where no sung
+    fundamental lives.
+    """
+    num_taps = factor * taps_per_phase
+    n = np.arange(num_taps) - (num_taps - 1) / 2
+    taps = np.sinc(n / factor) * np.blackman(num_taps)
+    return (taps / taps.sum()).astype(np.float32)
+
+
+def decimator_delay(factor, taps_per_phase=TAPS_PER_PHASE) -> int:
+    '''group delay of the decimation filter in input samples'''
+    if factor == 1:
+        return 0
+    return (factor * taps_per_phase - 1) // 2
+
+
+class PolyphaseDecimator(object):
+    """
+    Anti-aliased downsampling of hops of shape (num_channels, hop_size) by `factor`, stateful across hops.
+
+    The filter is split into `factor` phases, one per position within a block of `factor` input samples,
+    so only the output samples that are kept are ever computed.
+    """
+    def __init__(self, factor, hop_size, num_channels=1, taps_per_phase=TAPS_PER_PHASE):
+        if factor not in DECIMATION_FACTORS:
+            raise ValueError(f"Unsupported decimation factor {factor}, expected one of {list(DECIMATION_FACTORS)}")
+        if hop_size % factor:
+            raise ValueError(f"The hop size {hop_size} must be a multiple of the decimation factor {factor}")
+
+        self.factor = factor
+        self.taps = design_lowpass(factor, taps_per_phase)
+        # phases[t, m] weights sample m of the t-th block in the filter window
+        self.phases = np.ascontiguousarray(self.taps[::-1].reshape(taps_per_phase, factor))
+
+        # The newest filter length minus one block of input is kept for the next hop
+        self.history_size = len(self.taps) - factor
+        self.hop_size = hop_size
+        self.buffer = np.zeros((num_channels, self.history_size + hop_size), dtype=np.float32)
+        blocks = self.buffer.reshape(num_channels, -1, factor)
+        # windows[c, j, m, t] is blocks[c, j + t, m], one window of taps_per_phase blocks per output sample
+        self.windows = sliding_window_view(blocks, taps_per_phase, axis=1)
+        self.output = np.zeros((num_channels, hop_size // factor), dtype=np.float32)
+
+    def reset(self):
+        self.buffer[:] = 0
+
+    def __call__(self, signals) -> np.ndarray:
+        """
+        Filter and downsample one hop, returns the reused (num_channels, hop_size // factor) output
+        """
+        self.buffer[:, self.history_size:] = signals
+        np.einsum("cjmt,tm->cj", self.windows, self.phases, out=self.output)
+        self.buffer[:, :self.history_size] = self.buffer[:, self.hop_size:]
+        return self.output
@@ -0,0 +1,182 @@
+import json
+import os
+import time
+import numpy as np
+from .capture import make_capture_source
+from .pitch_detector import PitchDetector
+from .ring_buffer import SampleRing
+
+CACHE_PATH = os.path.join(os.path.expanduser("~"), ".sing_pong", "capture_settings.json")
+
+# (hop_size, buf_size) pairs at 44.1 kHz. Windows shorter than 2048 samples cannot resolve the lowest voices.
+CANDIDATES = [
+    (256, 2048),
+    (512, 2048),
+    (256, 4096),
+    (1024, 2048),
+    (512, 4096),
+    (1024, 4096),
+]
+DEFAULT_SETTINGS = {"buffer_size": 1024, "buf_size": 4096}
+
+PROBE_SECONDS = 1.5
+# A candidate is rejected if callbacks arrive this late, analysis takes this share of a hop,
+# or a steady note jumps by this many semitones from hop to hop
+MAX_LATE_CALLBACK_RATE = 0.02
+MAX_DSP_LOAD = 0.5
+MAX_PITCH_JITTER = 0.35
+MIN_VOICED_HOPS = 10
+# A probe that hears no steady note is repeated this many times before calibration gives up
+MAX_SILENT_PROBES = 3
+
+
+def algorithmic_latency(hop_size, buf_size, sample_rate) -> float:
+    '''seconds until a sound shows up in the pitch estimate: one hop plus half the analysis window'''
+    return (hop_size + buf_size / 2) / sample_rate
+
+
+def power_of_two(value) -> int:
+    return int(2 ** round(np.log2(value)))
+
+
+def probe(device_name, sample_rate, num_channels, hop_size, buf_size, capture_source="sdl", pitch_backend="aubio",
+          duration=PROBE_SECONDS) -> dict:
+    """
+    Capture `duration` seconds with one configuration and measure callback timing, DSP cost and pitch stability
+    """
+    pitch_detector = PitchDetector(hop_size, sample_rate, 0.8, num_channels, pitch_backend, buf_size=buf_size)
+    sample_ring = SampleRing(hop_size, num_channels=num_channels)
+
+    capacity = int(2 * duration * sample_rate / hop_size) + 16
+    arrivals = np.zeros(capacity)
+    costs = np.zeros(capacity)
+    pitches = np.zeros(capacity)
+    count = [0]
+
+    def callback(source, audio_memory_view):
+        index = count[0]
+        if index >= capacity:
+            return
+        start = time.perf_counter()
+        signals = sample_ring.write(np.frombuffer(audio_memory_view, dtype=np.float32), start)
+        channel_pitches, _ = pitch_detector.get_pitch_confidence_batch(signals)
+        costs[index] = time.perf_counter() - start
+        arrivals[index] = start
+        pitches[index] = channel_pitches[0]
+        count[0] = index + 1
+
+    source = make_capture_source(capture_source, device_name, sample_rate, hop_size, num_channels, callback)
+    source.pause(0)
+    time.sleep(duration)
+    source.pause(1)
+    source.close()
+
+    received = count[0]
+    period = hop_size / sample_rate
+    result = {
+        "buffer_size": hop_size,
+        "buf_size": buf_size,
+        "latency_ms": 1000 * algorithmic_latency(hop_size, buf_size, sample_rate),
+        "callbacks": received,
+    }
+    if received < 4:
+        result["ok"] = False
+        return result
+
+    # Chunks missing between the first and the last callback are xruns
+    intervals = np.diff(arrivals[:received])
+    expected = (arrivals[received - 1] - arrivals[0]) / period + 1
+    result["xruns"] = int(max(0, round(expected - received)))
+    result["late_callback_rate"] = float(np.mean(intervals > 1.5 * period))
+    result["dsp_load_p99"] = float(np.percentile(costs[:received], 99) / period)
+
+    # Hop to hop pitch changes while voiced, ignoring hops before the window is filled
+    warmup = buf_size // hop_size
+    voiced = pitches[warmup:received]
+    steady = (voiced[1:] > 0) & (voiced[:-1] > 0)
+    result["voiced_hops"] = int(np.sum(voiced > 0))
+    # Without enough sung hops the pitch stability is unknown, which fails the candidate
+    result["voiced"] = bool(np.sum(steady) >= MIN_VOICED_HOPS)
+    if result["voiced"]:
+        result["pitch_jitter"] = float(np.median(np.abs(np.diff(voiced))[steady]))
+
+    result["ok"] = (result["xruns"] == 0
+                    and result["late_callback_rate"] <= MAX_LATE_CALLBACK_RATE
+                    and result["dsp_load_p99"] <= MAX_DSP_LOAD
+                    and result["voiced"]
+                    and result["pitch_jitter"] <= MAX_PITCH_JITTER)
+    return result
+
+
+def cache_key(device_name, sample_rate, num_channels) -> str:
+    return f"{device_name}@{sample_rate}/{num_channels}"
+
+
+def load_cache() -> dict:
+    try:
+        with open(CACHE_PATH) as f:
+            return json.load(f)
+    except (IOError, ValueError):
+        return {}
+
+
+def store_cache(key, settings):
+    cache = load_cache()
+    cache[key] = settings
+    os.makedirs(os.path.dirname(CACHE_PATH), exist_ok=True)
+    with open(CACHE_PATH, "w") as f:
+        json.dump(cache, f, indent=2)
+
+
+def calibrate(device_name, sample_rate, num_channels=1, capture_source="sdl", pitch_backend="aubio",
+              use_cache=True) -> dict:
+    """
+    Pick the lowest latency hop and window size this machine and device can sustain.
+
+    Candidates are probed from lowest to highest latency while the player sings a steady note,
+    the first one that passes wins. A probe that hears no note is repeated, if the player stays silent
+    the defaults are used. Only a candidate that passed is cached per device name, so later launches
+    skip the probe.
+    """
+    # Only real devices are worth remembering
+    use_cache = use_cache and capture_source == "sdl"
+    key = cache_key(device_name, sample_rate, num_channels)
+    if use_cache:
+        cached = load_cache().get(key)
+        if cached is not None:
+            return {"buffer_size": cached["buffer_size"], "buf_size": cached["buf_size"]}
+
+    # Candidates are defined for 44.1 kHz, scale them to keep about the same durations.
+    # SDL chunk sizes and FFT sizes must stay powers of two.
+    scale = sample_rate / 44100
+    candidates = sorted(
+        {(power_of_two(hop * scale), power_of_two(buf * scale)) for hop, buf in CANDIDATES},
+        key=lambda c: algorithmic_latency(c[0], c[1], sample_rate))
+
+    print(f"[{device_name}] Calibrating capture latency, please sing a steady note...")
+    settings = None
+    silent = False
+    for hop_size, buf_size in candidates:
+        for _ in range(MAX_SILENT_PROBES):
+            result = probe(device_name, sample_rate, num_channels, hop_size, buf_size, capture_source, pitch_backend)
+            print(f"[{device_name}] {result}")
+            silent = result["callbacks"] >= 4 and not result["voiced"]
+            if not silent:
+                break
+            print(f"[{device_name}] No steady note heard, please sing...")
+        if result["ok"]:
+            settings = {"buffer_size": hop_size, "buf_size": buf_size}
+            break
+        if silent:
+            break
+
+    if settings is None:
+        # Nothing validated, probe again on the next launch
+        print(f"[{device_name}] Calibration failed, using the defaults {DEFAULT_SETTINGS}")
+        return dict(DEFAULT_SETTINGS)
+
+    print(f"[{device_name}] Using {settings}")
+    if use_cache:
+        store_cache(key, dict(settings, latency_ms=1000 * algorithmic_latency(
+            settings["buffer_size"], settings["buf_size"], sample_rate)))
+    return settings
@@ -1,6 +1,8 @@
 from .control import Control
 
 
-def main(fullscreen, difficulty, size, audio_device_name_1, audio_device_name_2):
-    app = Control(fullscreen, difficulty, size, audio_device_name_1, audio_device_name_2)
+def main(fullscreen, difficulty, size, audio_device_name_1, audio_device_name_2, audio_settings=None, fps=60,
+         dirty_rects=False):
+    app = Control(fullscreen, difficulty, size, audio_device_name_1, audio_device_name_2, audio_settings, fps,
+                  dirty_rects)
     app.run()
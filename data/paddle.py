@@ -1,4 +1,5 @@
 import pygame as pg
+from . import tools
 
 
 class Paddle:
@@ -8,42 +9,57 @@ class Paddle:
         self.rect = self.surface.get_rect()
         self.rect.x = x
         self.rect.y = y
+        # The rect is rounded, fractional movement accumulates here
+        self.x = float(x)
+        self.y = float(y)
+        self.previous_y = self.y
+        self.draw_rect = self.rect.copy()
         self.color = color
         self.surface.fill(self.color)
         self.speed = speed
         self.desired_y = y
+        # Pixels per frame at tools.REFERENCE_FPS that a key press moves the target
         self.movement_multiplier = 10
 
     def _move(self, x, y, time_delta):
-        # self.rect[0] += int(x *  time_delta)
-        # self.rect[1] += int(y *  time_delta)
-        self.rect[0] += x * self.speed * time_delta
-        self.rect[1] += y * self.speed * time_delta
+        self.x += x * self.speed * time_delta
+        self.y += y * self.speed * time_delta
+        self.rect.x = round(self.x)
+        self.rect.y = round(self.y)
 
     def move_up(self, time_delta):
-        self.desired_y += (-1 * self.movement_multiplier)
+        self.desired_y += (-1 * self.movement_multiplier * tools.REFERENCE_FPS * time_delta)
 
     def move_down(self, time_delta):
-        self.desired_y += (1 * self.movement_multiplier)
+        self.desired_y += (1 * self.movement_multiplier * tools.REFERENCE_FPS * time_delta)
 
     def update_desired_y(self, desired_y):
         self.desired_y = desired_y
 
     def update_pos(self, time_delta):
-        delta = self.desired_y - self.rect[1]
+        self.previous_y = self.y
+        delta = self.desired_y - self.y
 
         # if self.name == "right":
-        #     print(f"desired y: {self.desired_y}, self.rect[1]: {self.rect[1]}, delta: {delta}")
+        #     print(f"desired y: {self.desired_y}, self.y: {self.y}, delta: {delta}")
 
         if abs(delta) <= 3:
             return
 
-        distance = 4
+        # Stop at the target instead of stepping past it
+        distance = min(4, abs(delta) / (self.speed * time_delta))
         direction = distance if delta >= 0 else -1 * distance
         self._move(0, direction, time_delta)
 
     def update(self, screen_rect):
         self.rect.clamp_ip(screen_rect)
+        self.x = min(max(self.x, screen_rect.left), screen_rect.right - self.rect.width)
+        self.y = min(max(self.y, screen_rect.top), screen_rect.bottom - self.rect.height)
 
-    def render(self, screen):
-        screen.blit(self.surface, self.rect)
+    def interpolated_rect(self, interpolation=1.0):
+        self.draw_rect.x = self.rect.x
+        self.draw_rect.y = round(self.previous_y + (self.y - self.previous_y) * interpolation)
+        return self.draw_rect
+
+    def render(self, screen, interpolation=1.0):
+        screen.blit(self.surface, self.interpolated_rect(interpolation))
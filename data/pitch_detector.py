@@ -0,0 +1,135 @@
+from typing import Tuple
+import numpy as np
+from .decimator import PolyphaseDecimator
+from .voice_activity import VoiceActivityGate
+from .yin import YinPitch
+
+try:
+    import aubio
+except ImportError:
+    # Only needed for the aubio backend
+    aubio = None
+
+
+class AubioBackend(object):
+    """
+    One aubio.pitch object per channel; aubio keeps the overlapping window internally
+    """
+    def __init__(self, method, buf_size, hop_size, sample_rate, num_channels):
+        if aubio is None:
+            raise ImportError("The aubio pitch backend requires the aubio package, use the numpy backend instead")
+
+        self.pitch_os = [
+            aubio.pitch(method=method, buf_size=buf_size, hop_size=hop_size, samplerate=int(round(sample_rate)))
+            for _ in range(num_channels)
+        ]
+        self.pitches = np.zeros(num_channels, dtype=np.float32)
+        self.confidences = np.zeros(num_channels, dtype=np.float32)
+
+    def set_unit(self, unit):
+        for pitch_o in self.pitch_os:
+            pitch_o.set_unit(unit)
+
+    def set_tolerance(self, tolerance):
+        for pitch_o in self.pitch_os:
+            pitch_o.set_tolerance(tolerance)
+
+    def set_silence(self, silence):
+        for pitch_o in self.pitch_os:
+            pitch_o.set_silence(silence)
+
+    def __call__(self, signals) -> Tuple[np.ndarray, np.ndarray]:
+        for channel, pitch_o in enumerate(self.pitch_os):
+            self.pitches[channel] = pitch_o(signals[channel])[0]
+            self.confidences[channel] = pitch_o.get_confidence()
+
+        return self.pitches, self.confidences
+
+
+# The numpy backend analyses all channels in one vectorized call
+PITCH_BACKENDS = {
+    "aubio": AubioBackend,
+    "numpy": YinPitch,
+}
+
+
+class PitchDetector(object):
+    """
+    Estimate the pitch/fundamental frequency of an audio signal, one or more channels at a time.
+
+    With `voice_gate` a `VoiceActivityGate` runs first and the pitch analysis is skipped while no channel
+    is voiced. Unvoiced channels report pitch and confidence 0, `voiced` holds the latest decisions.
+    Skipped hops never reach the analysis window, so after an onset the window still holds audio from
+    before the pause. Those hops are analysed but reported unvoiced until the window is filled with
+    audio from after the onset.
+
+    With `decimation` > 1 every hop is low-pass filtered and downsampled by that factor first. The
+    backend then analyses `buf_size` and `hop_size` divided by the factor at the reduced sample rate,
+    which covers the same duration and frequency resolution at a fraction of the cost.
+    """
+    def __init__(self, hop_size, sample_rate, pitch_tolerance=0.8, num_channels=1, backend="aubio",
+                 method="yinfft", buf_size=4096, voice_gate=False, decimation=1):
+        if backend not in PITCH_BACKENDS:
+            raise ValueError(f"Unknown pitch backend {backend}, expected one of {list(PITCH_BACKENDS)}")
+
+        self.decimator = None
+        if decimation > 1:
+            self.decimator = PolyphaseDecimator(decimation, hop_size, num_channels)
+            hop_size //= decimation
+            buf_size //= decimation
+            sample_rate /= decimation
+
+        # The hop size is the number of samples in between successive frames.
+        # The hop size should be smaller than the frame size, so that frames overlap.
+        self.backend_name = backend
+        self.backend = PITCH_BACKENDS[backend](method, buf_size, hop_size, sample_rate, num_channels)
+        self.backend.set_unit("midi")
+        self.backend.set_tolerance(pitch_tolerance)
+        self.backend.set_silence(-20)
+
+        # Shape (num_channels, hop_size) view for single channel calls, at the capture rate
+        self.mono_signals = np.zeros((1, hop_size * decimation), dtype=np.float32)
+
+        self.voice_gate = VoiceActivityGate(hop_size, sample_rate, num_channels) if voice_gate else None
+        self.voiced = np.ones(num_channels, dtype=bool)
+        # Hops analysed in a row since the last skipped one, and how many make up a whole window
+        self.fresh_hops = 0
+        self.window_hops = -(-buf_size // hop_size)
+        self.pitches = np.zeros(num_channels, dtype=np.float32)
+        self.confidences = np.zeros(num_channels, dtype=np.float32)
+
+    def get_pitch_confidence_tuple(self, signal) -> Tuple[float, float]:
+        self.mono_signals[0] = signal
+        pitches, confidences = self.get_pitch_confidence_batch(self.mono_signals)
+        pitch = pitches[0]
+        confidence = confidences[0]
+
+        # print("{} / {}".format(pitch, confidence))
+
+        return pitch, confidence
+
+    def get_pitch_confidence_batch(self, signals) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Analyse one hop of every channel in a single pass.
+        `signals` has shape (num_channels, hop_size), the returned arrays are reused by the next call.
+        """
+        if self.decimator is not None:
+            signals = self.decimator(signals)
+
+        if self.voice_gate is None:
+            return self.backend(signals)
+
+        voiced = self.voice_gate(signals)
+        if not voiced.any():
+            self.fresh_hops = 0
+            self.voiced[:] = False
+            self.pitches[:] = 0
+            self.confidences[:] = 0
+            return self.pitches, self.confidences
+
+        pitches, confidences = self.backend(signals)
+        self.fresh_hops += 1
+        np.logical_and(voiced, self.fresh_hops >= self.window_hops, out=self.voiced)
+        np.multiply(pitches, self.voiced, out=self.pitches)
+        np.multiply(confidences, self.voiced, out=self.confidences)
+        return self.pitches, self.confidences
@@ -0,0 +1,251 @@
+import abc
+import inspect
+import math
+import numpy as np
+
+
+class ValueRing(object):
+    """
+    Fixed-size ring of the most recent values with a running sum
+    """
+    def __init__(self, size):
+        if size < 1:
+            raise ValueError(f"Ring size must be at least 1, got {size}")
+        self.size = size
+        self.values = np.zeros(size, dtype=np.float64)
+        self.count = 0
+        self.index = 0
+        self.total = 0.0
+
+    def reset(self):
+        self.count = 0
+        self.index = 0
+        self.total = 0.0
+
+    def append(self, value):
+        if self.count == self.size:
+            self.total -= self.values[self.index]
+        else:
+            self.count += 1
+        self.values[self.index] = value
+        self.total += value
+        self.index = (self.index + 1) % self.size
+
+    def filled(self) -> np.ndarray:
+        return self.values[:self.count]
+
+    def mean(self) -> float:
+        return self.total / self.count
+
+
+class PitchFilter(abc.ABC):
+    """
+    Smooths the stream of accepted pitches of one player.
+    `update` takes one pitch (MIDI) with its hop timestamp (seconds) and returns the smoothed pitch.
+    Invalid parameters raise ValueError.
+    """
+    def __init__(self):
+        self.value = None
+
+    def reset(self):
+        self.value = None
+
+    @abc.abstractmethod
+    def update(self, pitch, timestamp) -> float:
+        pass
+
+    def predict(self, timestamp) -> float:
+        '''expected pitch at `timestamp`, filters without a motion model hold their last value'''
+        return self.value
+
+
+def window_size(window) -> int:
+    if window < 1 or window != int(window):
+        raise ValueError(f"Filter window must be a whole number of hops of at least 1, got {window}")
+    return int(window)
+
+
+def positive(name, value) -> float:
+    if not value > 0:
+        raise ValueError(f"{name} must be positive, got {value}")
+    return float(value)
+
+
+class MovingAverageFilter(PitchFilter):
+    def __init__(self, window=3):
+        PitchFilter.__init__(self)
+        self.ring = ValueRing(window_size(window))
+
+    def reset(self):
+        PitchFilter.reset(self)
+        self.ring.reset()
+
+    def update(self, pitch, timestamp) -> float:
+        self.ring.append(pitch)
+        self.value = self.ring.mean()
+        return self.value
+
+
+class MedianFilter(PitchFilter):
+    '''robust against single octave errors'''
+    def __init__(self, window=5):
+        PitchFilter.__init__(self)
+        self.ring = ValueRing(window_size(window))
+
+    def reset(self):
+        PitchFilter.reset(self)
+        self.ring.reset()
+
+    def update(self, pitch, timestamp) -> float:
+        self.ring.append(pitch)
+        self.value = float(np.median(self.ring.filled()))
+        return self.value
+
+
+class ExponentialMovingAverageFilter(PitchFilter):
+    def __init__(self, alpha=0.5):
+        PitchFilter.__init__(self)
+        if not 0 < alpha <= 1:
+            raise ValueError(f"EMA alpha must be in (0, 1], got {alpha}")
+        self.alpha = float(alpha)
+
+    def update(self, pitch, timestamp) -> float:
+        if self.value is None:
+            self.value = pitch
+        else:
+            self.value += self.alpha * (pitch - self.value)
+        return self.value
+
+
+class OneEuroFilter(PitchFilter):
+    """
+    Adaptive low-pass filter (Casiez et al., 2012): heavy smoothing while the pitch is steady,
+    little lag while it moves fast. Cutoffs are in Hz, `beta` scales the cutoff with the pitch speed.
+    """
+    def __init__(self, min_cutoff=1.0, beta=2.0, d_cutoff=1.0):
+        PitchFilter.__init__(self)
+        self.min_cutoff = positive("min_cutoff", min_cutoff)
+        if beta < 0:
+            raise ValueError(f"beta must not be negative, got {beta}")
+        self.beta = float(beta)
+        self.d_cutoff = positive("d_cutoff", d_cutoff)
+        self.derivative = 0.0
+        self.last_timestamp = None
+
+    def reset(self):
+        PitchFilter.reset(self)
+        self.derivative = 0.0
+        self.last_timestamp = None
+
+    @staticmethod
+    def smoothing_factor(cutoff, time_delta) -> float:
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / time_delta)
+
+    def update(self, pitch, timestamp) -> float:
+        if self.value is None or timestamp <= self.last_timestamp:
+            if self.value is None:
+                self.value = pitch
+            self.last_timestamp = timestamp
+            return self.value
+
+        time_delta = timestamp - self.last_timestamp
+        self.last_timestamp = timestamp
+
+        derivative = (pitch - self.value) / time_delta
+        self.derivative += self.smoothing_factor(self.d_cutoff, time_delta) * (derivative - self.derivative)
+
+        cutoff = self.min_cutoff + self.beta * abs(self.derivative)
+        self.value += self.smoothing_factor(cutoff, time_delta) * (pitch - self.value)
+        return self.value
+
+
+class KalmanPitchFilter(PitchFilter):
+    """
+    Constant velocity Kalman filter on pitch (MIDI) and pitch velocity (semitones per second).
+
+    `predict` extrapolates the pitch to a later time, e.g. when the next frame is presented, which hides
+    the capture and analysis delay. Extrapolation stops `max_horizon` seconds after the last measurement
+    so the paddle does not drift away when the player stops singing, and after a pause of `max_gap`
+    seconds the next pitch starts a new track.
+    """
+    def __init__(self, acceleration_noise=2000.0, measurement_noise=0.1, max_horizon=0.15, max_gap=0.5):
+        PitchFilter.__init__(self)
+        self.acceleration_noise = positive("acceleration_noise", acceleration_noise)
+        self.measurement_noise = positive("measurement_noise", measurement_noise)
+        if max_horizon < 0:
+            raise ValueError(f"max_horizon must not be negative, got {max_horizon}")
+        self.max_horizon = float(max_horizon)
+        self.max_gap = positive("max_gap", max_gap)
+        self.reset()
+
+    def reset(self):
+        PitchFilter.reset(self)
+        self.velocity = 0.0
+        # Covariance of (pitch, velocity)
+        self.p00 = self.p01 = self.p11 = 0.0
+        self.last_timestamp = None
+
+    def update(self, pitch, timestamp) -> float:
+        if self.value is None or not 0 <= timestamp - self.last_timestamp <= self.max_gap:
+            self.value = pitch
+            self.velocity = 0.0
+            self.p00 = self.measurement_noise
+            self.p01 = 0.0
+            self.p11 = 100.0
+            self.last_timestamp = timestamp
+            return self.value
+
+        # Propagate the state and its covariance to the measurement time
+        dt = timestamp - self.last_timestamp
+        self.last_timestamp = timestamp
+        q = self.acceleration_noise
+        self.value += self.velocity * dt
+        self.p00 += dt * (2 * self.p01 + dt * self.p11) + q * dt ** 3 / 3
+        self.p01 += dt * self.p11 + q * dt ** 2 / 2
+        self.p11 += q * dt
+
+        # Correct with the measured pitch
+        innovation = pitch - self.value
+        gain_pitch = self.p00 / (self.p00 + self.measurement_noise)
+        gain_velocity = self.p01 / (self.p00 + self.measurement_noise)
+        self.value += gain_pitch * innovation
+        self.velocity += gain_velocity * innovation
+        self.p11 -= gain_velocity * self.p01
+        self.p00 *= 1 - gain_pitch
+        self.p01 *= 1 - gain_pitch
+        return self.value
+
+    def predict(self, timestamp) -> float:
+        if self.value is None:
+            return None
+        horizon = min(max(timestamp - self.last_timestamp, 0.0), self.max_horizon)
+        return self.value + self.velocity * horizon
+
+
+PITCH_FILTERS = {
+    "moving_average": MovingAverageFilter,
+    "median": MedianFilter,
+    "ema": ExponentialMovingAverageFilter,
+    "one_euro": OneEuroFilter,
+    "kalman": KalmanPitchFilter,
+}
+
+
+def make_pitch_filter(spec="moving_average") -> PitchFilter:
+    """
+    Create a filter from "<name>" or "<name>:<param>,<param>,...", e.g. "median:5", "ema:0.3", "one_euro:1.0,0.5"
+    or "kalman:2000,0.1"
+    """
+    name, _, params = spec.partition(":")
+    if name not in PITCH_FILTERS:
+        raise ValueError(f"Unknown pitch filter {name}, expected one of {list(PITCH_FILTERS)}")
+
+    try:
+        args = [float(p) for p in params.split(",") if p]
+        inspect.signature(PITCH_FILTERS[name]).bind(*args)
+    except TypeError:
+        raise ValueError(f"Too many parameters for pitch filter {name}: {params}") from None
+    except ValueError:
+        raise ValueError(f"Pitch filter parameters must be numbers: {params}") from None
+    return PITCH_FILTERS[name](*args)
@@ -0,0 +1,161 @@
+from multiprocessing import shared_memory
+import multiprocessing
+import time
+import numpy as np
+from .pitch_detector import PitchDetector
+from .ring_buffer import SampleRing, PitchRing
+
+# Chunks buffered in shared memory before the worker starts losing them
+NUM_CHUNKS = 16
+RESULT_CAPACITY = 64
+
+
+class SharedRings(object):
+    """
+    Sample ring (parent -> worker) followed by one pitch ring per channel (worker -> parent) in one shared memory block
+    """
+    def __init__(self, shm, hop_size, num_channels):
+        self.sample_ring = SampleRing(hop_size, NUM_CHUNKS, num_channels, buffer=shm.buf)
+        offset = SampleRing.required_bytes(hop_size, NUM_CHUNKS, num_channels)
+        self.pitch_rings = []
+        for _ in range(num_channels):
+            self.pitch_rings.append(PitchRing(RESULT_CAPACITY, buffer=shm.buf, offset=offset))
+            offset += PitchRing.required_bytes(RESULT_CAPACITY)
+
+    @staticmethod
+    def required_bytes(hop_size, num_channels) -> int:
+        return (SampleRing.required_bytes(hop_size, NUM_CHUNKS, num_channels)
+                + num_channels * PitchRing.required_bytes(RESULT_CAPACITY))
+
+    @property
+    def backlog(self) -> int:
+        '''chunks submitted but not analysed yet'''
+        pitch_ring = self.pitch_rings[0]
+        write_index = pitch_ring.write_index
+        if write_index == 0:
+            return self.sample_ring.write_index
+        last_hop_index = pitch_ring.records[(write_index - 1) % pitch_ring.capacity]["hop_index"]
+        return int(self.sample_ring.write_index - last_hop_index - 1)
+
+
+def analyse_chunk(rings, pitch_detector, signals, index) -> bool:
+    """
+    Analyse chunk number `index` of the sample ring and publish one record per channel.
+    Returns False without publishing if the parent overwrote the chunk while it was copied.
+    """
+    timestamp = rings.sample_ring.read(index, signals)
+    if rings.sample_ring.write_index - index >= NUM_CHUNKS:
+        return False
+
+    start = time.perf_counter()
+    pitches, confidences = pitch_detector.get_pitch_confidence_batch(signals)
+    analysis_time = time.perf_counter() - start
+    rms = np.sqrt(np.einsum("ij,ij->i", signals, signals) / signals.shape[1])
+    for channel, pitch_ring in enumerate(rings.pitch_rings):
+        pitch_ring.push(timestamp, pitches[channel], confidences[channel], rms[channel], index,
+                        analysis_time, pitch_detector.voiced[channel])
+    return True
+
+
+def run_worker(shm_name, hop_size, sample_rate, pitch_tolerance, num_channels, pitch_backend, buf_size, voice_gate,
+               decimation, chunk_ready, stop_event):
+    """
+    Entry point of the worker process: analyse every chunk the parent publishes until stopped
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    rings = SharedRings(shm, hop_size, num_channels)
+    pitch_detector = PitchDetector(
+        hop_size, sample_rate, pitch_tolerance, num_channels, pitch_backend, buf_size=buf_size, voice_gate=voice_gate,
+        decimation=decimation)
+    signals = np.zeros((num_channels, hop_size), dtype=np.float32)
+
+    # Start with the next chunk the parent writes
+    next_index = rings.sample_ring.write_index
+    try:
+        while not stop_event.is_set():
+            chunk_ready.acquire(timeout=0.1)
+
+            write_index = rings.sample_ring.write_index
+            while next_index < write_index:
+                # The slot currently being written by the parent is never safe to read
+                if write_index - next_index >= NUM_CHUNKS:
+                    next_index = write_index - NUM_CHUNKS + 1
+
+                # A torn chunk is skipped
+                analyse_chunk(rings, pitch_detector, signals, next_index)
+                next_index += 1
+    finally:
+        # Numpy views must be gone before the shared memory can be closed
+        del rings
+        shm.close()
+
+
+class PitchWorker(object):
+    """
+    Runs pitch detection for one MicController in a dedicated process.
+
+    The audio callback only copies chunks into shared memory, so neither the analysis nor
+    the game loop can stall the other through the GIL.
+    """
+    def __init__(self, hop_size, sample_rate, pitch_tolerance, num_channels=1, pitch_backend="aubio", buf_size=4096,
+                 voice_gate=False, decimation=1):
+        self.hop_size = hop_size
+        self.sample_rate = sample_rate
+        self.pitch_tolerance = pitch_tolerance
+        self.num_channels = num_channels
+        self.pitch_backend = pitch_backend
+        self.buf_size = buf_size
+        self.voice_gate = voice_gate
+        self.decimation = decimation
+
+        self.shm = shared_memory.SharedMemory(create=True, size=SharedRings.required_bytes(hop_size, num_channels))
+        self.rings = SharedRings(self.shm, hop_size, num_channels)
+
+        # Spawn instead of fork, the parent runs SDL threads
+        self.context = multiprocessing.get_context("spawn")
+        self.chunk_ready = self.context.Semaphore(0)
+        self.stop_event = self.context.Event()
+        self.process = None
+
+    @property
+    def pitch_rings(self) -> list:
+        return self.rings.pitch_rings
+
+    @property
+    def backlog(self) -> int:
+        return self.rings.backlog
+
+    def start(self):
+        if self.process is not None:
+            return
+        self.stop_event.clear()
+        self.process = self.context.Process(
+            target=run_worker,
+            args=(self.shm.name, self.hop_size, self.sample_rate, self.pitch_tolerance, self.num_channels,
+                  self.pitch_backend, self.buf_size, self.voice_gate, self.decimation, self.chunk_ready,
+                  self.stop_event),
+            daemon=True,
+        )
+        self.process.start()
+
+    def submit(self, samples, timestamp):
+        self.rings.sample_ring.write(samples, timestamp)
+        self.chunk_ready.release()
+
+    def stop(self):
+        if self.process is None:
+            return
+        self.stop_event.set()
+        self.chunk_ready.release()
+        self.process.join(timeout=1.0)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.process = None
+
+    def close(self):
+        self.stop()
+        if self.rings is not None:
+            self.rings = None
+            self.shm.close()
+            self.shm.unlink()
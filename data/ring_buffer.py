@@ -0,0 +1,147 @@
+import numpy as np
+
+# One record per analysed hop
+PITCH_RECORD_DTYPE = np.dtype([
+    ("timestamp", np.float64),
+    ("pitch", np.float32),
+    ("confidence", np.float32),
+    ("rms", np.float32),
+    ("hop_index", np.int64),
+    # Seconds spent in pitch detection for this hop
+    ("analysis_time", np.float32),
+    # False if the voice activity gate skipped the pitch analysis
+    ("voiced", np.bool_),
+])
+
+# Every ring keeps its write counter in front of its data, so the whole ring can live in shared memory
+HEADER_BYTES = 8
+
+
+class SampleRing(object):
+    """
+    Preallocated float32 ring of fixed-size audio chunks.
+
+    The capture callback copies every chunk straight from the device buffer into the next slot,
+    so no intermediate bytes object or new array is created per callback. Interleaved multichannel
+    chunks are deinterleaved during that copy, every slot holds one row per channel.
+    If `buffer` is given (e.g. `SharedMemory.buf`), the ring is laid out in it starting at `offset`.
+    """
+    def __init__(self, chunk_size, num_chunks=8, num_channels=1, buffer=None, offset=0):
+        self.chunk_size = chunk_size
+        self.num_chunks = num_chunks
+        self.num_channels = num_channels
+
+        if buffer is None:
+            buffer = bytearray(SampleRing.required_bytes(chunk_size, num_chunks, num_channels))
+            offset = 0
+
+        self.header = np.ndarray((1,), dtype=np.int64, buffer=buffer, offset=offset)
+        offset += HEADER_BYTES
+        self.timestamps = np.ndarray((num_chunks,), dtype=np.float64, buffer=buffer, offset=offset)
+        offset += self.timestamps.nbytes
+        self.buffer = np.ndarray(
+            (num_chunks, num_channels, chunk_size), dtype=np.float32, buffer=buffer, offset=offset)
+
+        # Slot views are created once and reused
+        self.slots = [self.buffer[i] for i in range(num_chunks)]
+
+    @staticmethod
+    def required_bytes(chunk_size, num_chunks=8, num_channels=1) -> int:
+        return HEADER_BYTES + num_chunks * 8 + num_chunks * num_channels * chunk_size * 4
+
+    @property
+    def write_index(self) -> int:
+        return int(self.header[0])
+
+    def write(self, samples, timestamp=0.0) -> np.ndarray:
+        """
+        Copy one (interleaved) chunk into the next slot and return that slot, shape (num_channels, chunk_size).
+        The returned view stays valid until the ring wraps around.
+        """
+        write_index = self.write_index
+        slot = self.slots[write_index % self.num_chunks]
+        num_frames = min(len(samples) // self.num_channels, self.chunk_size)
+        slot[:, :num_frames] = samples[:num_frames * self.num_channels].reshape(num_frames, self.num_channels).T
+        if num_frames < self.chunk_size:
+            # Short chunk, pad with silence
+            slot[:, num_frames:] = 0
+        self.timestamps[write_index % self.num_chunks] = timestamp
+
+        # Publish the chunk only after it has been written
+        self.header[0] = write_index + 1
+        return slot
+
+    def read(self, index, out) -> float:
+        """
+        Copy chunk number `index` into `out` and return its timestamp.
+        """
+        out[:] = self.slots[index % self.num_chunks]
+        return float(self.timestamps[index % self.num_chunks])
+
+
+class PitchRing(object):
+    """
+    Lock-free single-producer/single-consumer ring of timestamped pitch records.
+
+    The producer (audio callback or pitch worker) fills a record and only then advances the write
+    counter. The consumer (game loop) copies everything between its read_index and the write counter.
+    A single aligned int64 store is atomic, so a record is never published half-written and no lock
+    is taken, also when producer and consumer live in different processes.
+    """
+    def __init__(self, capacity=64, buffer=None, offset=0):
+        self.capacity = capacity
+
+        if buffer is None:
+            buffer = bytearray(PitchRing.required_bytes(capacity))
+            offset = 0
+
+        self.header = np.ndarray((1,), dtype=np.int64, buffer=buffer, offset=offset)
+        self.records = np.ndarray((capacity,), dtype=PITCH_RECORD_DTYPE, buffer=buffer, offset=offset + HEADER_BYTES)
+
+        # Consumer side, always process local
+        self.read_index = self.write_index
+        self.dropped = 0
+        self.drained = np.zeros(capacity, dtype=PITCH_RECORD_DTYPE)
+
+    @staticmethod
+    def required_bytes(capacity=64) -> int:
+        return HEADER_BYTES + capacity * PITCH_RECORD_DTYPE.itemsize
+
+    @property
+    def write_index(self) -> int:
+        return int(self.header[0])
+
+    def push(self, timestamp, pitch, confidence, rms, hop_index, analysis_time=0.0, voiced=True):
+        write_index = self.write_index
+        self.records[write_index % self.capacity] = (
+            timestamp, pitch, confidence, rms, hop_index, analysis_time, voiced)
+        self.header[0] = write_index + 1
+
+    def drain(self) -> np.ndarray:
+        """
+        Return all records published since the last call, oldest first.
+        The result is a view into a preallocated buffer and is only valid until the next call.
+        """
+        write_index = self.write_index
+        count = write_index - self.read_index
+        if count > self.capacity:
+            # Consumer fell behind, the oldest records have been overwritten
+            self.dropped += count - self.capacity
+            count = self.capacity
+
+        start = write_index - count
+        first = start % self.capacity
+        num_head = min(count, self.capacity - first)
+        self.drained[:num_head] = self.records[first:first + num_head]
+        self.drained[num_head:count] = self.records[:count - num_head]
+
+        # The producer may have lapped us while copying; those records may be torn
+        lapped = self.write_index - self.capacity - start
+        if lapped > 0:
+            lapped = min(lapped, count)
+            self.dropped += lapped
+        else:
+            lapped = 0
+
+        self.read_index = write_index
+        return self.drained[lapped:count]
@@ -0,0 +1,154 @@
+import json
+import os
+import time
+import numpy as np
+from .ring_buffer import HEADER_BYTES
+
+# One record per analysed hop of one player
+HOP_RECORD_DTYPE = np.dtype([
+    ("timestamp", np.float64),
+    ("pitch", np.float32),
+    ("confidence", np.float32),
+    # Smoothed paddle position 0..1 after this hop, -1 for rejected hops
+    ("position", np.float32),
+])
+
+MANIFEST_NAME = "session.json"
+SAMPLES_SUFFIX = ".samples"
+HOPS_SUFFIX = ".hops"
+# One minute of 44.1 kHz audio before the first file grows
+INITIAL_SAMPLES = 44100 * 60
+INITIAL_HOPS = 4096
+
+
+class MemmapLog(object):
+    """
+    Append-only array in a memory-mapped file, laid out like the rings: an int64 count, then the records.
+
+    Appending is a memory copy into the page cache, the OS writes it back to disk on its own time.
+    When the file is full it is extended and mapped again with twice the capacity, which only changes
+    the file size and never waits for the disk. The count is published after the data, so a reader
+    that opens the file during the session sees complete records.
+    """
+    def __init__(self, path, dtype, capacity):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.count = 0
+        self.file = open(path, "w+b")
+        self._map(capacity)
+
+    def _map(self, capacity):
+        self.capacity = capacity
+        self.file.truncate(HEADER_BYTES + capacity * self.dtype.itemsize)
+        self.memmap = np.memmap(self.file, dtype=np.uint8, mode="r+")
+        self.header = self.memmap[:HEADER_BYTES].view(np.int64)
+        self.data = self.memmap[HEADER_BYTES:].view(self.dtype)
+        self.header[0] = self.count
+
+    def reserve(self, num_records) -> np.ndarray:
+        """
+        Return the view the next `num_records` records are written to, they count once `commit` is called
+        """
+        if self.count + num_records > self.capacity:
+            self._map(max(2 * self.capacity, self.count + num_records))
+        return self.data[self.count:self.count + num_records]
+
+    def commit(self, num_records):
+        self.count += num_records
+        self.header[0] = self.count
+
+    def append(self, values):
+        self.reserve(len(values))[:] = values
+        self.commit(len(values))
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.memmap.flush()
+        # Numpy views must be gone before the file is closed
+        self.header = self.data = self.memmap = None
+        self.file.close()
+
+
+def read_log(path, dtype) -> np.ndarray:
+    """
+    Map a MemmapLog read-only and return a view on its records, nothing is copied
+    """
+    memmap = np.memmap(path, dtype=np.uint8, mode="r")
+    count = int(memmap[:HEADER_BYTES].view(np.int64)[0])
+    return memmap[HEADER_BYTES:].view(dtype)[:count]
+
+
+class PlayerRecording(object):
+    """
+    Raw samples and per-hop pitch records of one player
+    """
+    def __init__(self, path_prefix):
+        self.samples = MemmapLog(path_prefix + SAMPLES_SUFFIX, np.float32, INITIAL_SAMPLES)
+        self.hops = MemmapLog(path_prefix + HOPS_SUFFIX, HOP_RECORD_DTYPE, INITIAL_HOPS)
+
+    def add_samples(self, samples):
+        self.samples.append(samples)
+
+    def add_hops(self, records, filtered_pitches, min_pitch, max_pitch):
+        """
+        Store drained pitch ring records with the filtered pitch after each of them, NaN for rejected hops
+        """
+        num_records = len(records)
+        hops = self.hops.reserve(num_records)
+        hops["timestamp"] = records["timestamp"]
+        hops["pitch"] = records["pitch"]
+        hops["confidence"] = records["confidence"]
+        positions = np.clip((filtered_pitches - min_pitch) / (max_pitch - min_pitch), 0, 1)
+        hops["position"] = np.where(np.isnan(filtered_pitches), -1, positions)
+        self.hops.commit(num_records)
+
+    def close(self):
+        self.samples.close()
+        self.hops.close()
+
+
+class SessionRecorder(object):
+    """
+    Records every player of a session into `directory`: player_<n>.samples, player_<n>.hops and
+    a session.json manifest. Load a recording with `load_session`, replay a player's audio with
+    the capture source file:<directory>/player_<n>.samples.
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.manifest = {"start_time": time.time(), "players": []}
+        self.recordings = []
+
+    def add_player(self, name, sample_rate, hop_size) -> PlayerRecording:
+        file_name = f"player_{len(self.recordings)}"
+        recording = PlayerRecording(os.path.join(self.directory, file_name))
+        self.recordings.append(recording)
+        self.manifest["players"].append(
+            {"name": name, "file_name": file_name, "sample_rate": sample_rate, "hop_size": hop_size})
+        with open(os.path.join(self.directory, MANIFEST_NAME), "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        return recording
+
+    def close(self):
+        for recording in self.recordings:
+            recording.close()
+
+
+def load_session(directory) -> list:
+    """
+    One dict per player with its manifest entry plus "samples" (float32) and "hops" (HOP_RECORD_DTYPE),
+    both read-only memory-mapped views
+    """
+    with open(os.path.join(directory, MANIFEST_NAME)) as f:
+        manifest = json.load(f)
+
+    players = []
+    for player in manifest["players"]:
+        path_prefix = os.path.join(directory, player["file_name"])
+        players.append(dict(
+            player,
+            samples=read_log(path_prefix + SAMPLES_SUFFIX, np.float32),
+            hops=read_log(path_prefix + HOPS_SUFFIX, HOP_RECORD_DTYPE),
+        ))
+    return players
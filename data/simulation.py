@@ -0,0 +1,207 @@
+import random
+import numpy as np
+import pygame as pg
+from . import ball as ball_
+from . import paddle
+from . import AI
+
+WINNING_SCORE = 9
+BASE_PADDLE_SPEED = 200
+PADDLE_WIDTH = 10
+PADDLE_HEIGHT = 100
+# Distance of the paddles from the side walls
+PADDLE_PADDING = 25
+
+# Events of a step, in the order they happened
+BOUNCE = ball_.BOUNCE
+GUTTER = ball_.GUTTER
+SCORE = "score"
+WIN = "win"
+
+
+class Match(object):
+    """
+    Rules of a classic game without display, sound or microphones: ball, paddles, AI and score.
+
+    Players steer by setting paddle targets with `set_position` (the normalized pitch position of
+    `MicChannel.get_normalized_position`) or `nudge` (keys), `step` advances the game by a fixed
+    timestep and lists what happened in `events`, so a presentation layer can play sounds and redraw
+    the score. With one player the AI plays left. The same seed and the same inputs always play out
+    the same match.
+    """
+    def __init__(self, screen_rect, difficulty="medium", num_players=1, seed=None, winning_score=WINNING_SCORE):
+        self.screen_rect = pg.Rect(screen_rect)
+        self.num_players = num_players
+        self.winning_score = winning_score
+        self.random = random.Random(seed)
+
+        paddle_y = self.screen_rect.centery - (PADDLE_HEIGHT // 2)
+        paddle_left_speed = BASE_PADDLE_SPEED if num_players > 1 else BASE_PADDLE_SPEED / 1.7
+        pad_right = self.screen_rect.width - PADDLE_WIDTH - PADDLE_PADDING
+
+        self.ball = ball_.Ball(self.screen_rect, 10, 10, (0, 255, 0), rng=self.random)
+        self.paddle_left = paddle.Paddle(
+            "left", PADDLE_PADDING, paddle_y, PADDLE_WIDTH, PADDLE_HEIGHT, paddle_left_speed, (150, 150, 150))
+        self.paddle_right = paddle.Paddle(
+            "right", pad_right, paddle_y, PADDLE_WIDTH, PADDLE_HEIGHT, BASE_PADDLE_SPEED, (150, 150, 150))
+        self.paddles = {"left": self.paddle_left, "right": self.paddle_right}
+
+        self.ai = None
+        if num_players == 1:
+            self.ai = AI.AIPaddle(self.screen_rect, difficulty, self.paddle_left, rng=self.random)
+
+        self.events = []
+        self.score = [0, 0]
+        self.reset()
+
+    def reset(self):
+        # Updated in place, presentation layers may hold on to the list
+        self.score[:] = [0, 0]
+        self.winner = None
+        self.time = 0.0
+        self.steps = 0
+        self.ball.set_ball()
+        for side_paddle in self.paddles.values():
+            side_paddle.update_desired_y((self.screen_rect.bottom - self.screen_rect.top) / 2)
+        if self.ai is not None:
+            self.ai.reset()
+
+    def set_position(self, side, position):
+        """
+        Aim the paddle of `side` at a normalized position, 1 is the top of the screen. Negative positions are ignored.
+        """
+        if position < 0:
+            return
+        # Top is 0, bottom grows larger. Invert the incoming pitch
+        self.paddles[side].update_desired_y((1.0 - position) * self.screen_rect.bottom)
+
+    def nudge(self, side, direction, time_delta):
+        if direction < 0:
+            self.paddles[side].move_up(time_delta)
+        elif direction > 0:
+            self.paddles[side].move_down(time_delta)
+
+    def step(self, time_delta) -> list:
+        """
+        Advance the match by `time_delta` seconds and return the reused list of events of this step
+        """
+        self.events.clear()
+        self.ball.events.clear()
+
+        if self.ai is not None:
+            self.ai.update(self.ball, time_delta)
+
+        # Keep the paddles inside the screen
+        self.paddle_left.update(self.screen_rect)
+        self.paddle_right.update(self.screen_rect)
+
+        hit_side = self.ball.update(self.paddle_left.rect, self.paddle_right.rect, time_delta)
+        self.events.extend(self.ball.events)
+        if hit_side:
+            self.adjust_score(hit_side)
+
+        self.paddle_right.update_pos(time_delta)
+        self.paddle_left.update_pos(time_delta)
+
+        self.time += time_delta
+        self.steps += 1
+        return self.events
+
+    def adjust_score(self, hit_side):
+        if hit_side == -1:
+            self.score[1] += 1
+        elif hit_side == 1:
+            self.score[0] += 1
+        self.events.append(SCORE)
+
+        if self.winner is None:
+            for i in range(0, len(self.score)):
+                if self.score[i] >= self.winning_score:
+                    self.winner = i
+                    self.events.append(WIN)
+
+
+class PaddleInput(object):
+    """
+    A player as seen by the match: where they want their paddle, read once per game loop frame.
+    Returns a normalized position like `MicChannel.get_normalized_position`, -1 while they give none.
+    """
+    def read(self, match) -> float:
+        return -1
+
+
+class ScriptedInput(PaddleInput):
+    """
+    Replays a sequence of positions, one per read, e.g. the "position" column of a recorded session's hops
+    """
+    def __init__(self, positions, loop=True):
+        self.positions = np.asarray(positions, dtype=np.float64)
+        self.loop = loop
+        self.index = 0
+
+    def read(self, match) -> float:
+        if self.index >= len(self.positions):
+            if not self.loop or len(self.positions) == 0:
+                return -1
+            self.index = 0
+        position = self.positions[self.index]
+        self.index += 1
+        return float(position)
+
+
+class TrackingInput(PaddleInput):
+    """
+    Follows the ball with a normally distributed error of `error` (fraction of the screen height)
+    and drops out `silence` of the time, like a singer who pauses for breath
+    """
+    def __init__(self, error=0.05, silence=0.1, seed=None):
+        self.error = error
+        self.silence = silence
+        self.random = random.Random(seed)
+
+    def read(self, match) -> float:
+        if self.random.random() < self.silence:
+            return -1
+        target = 1.0 - match.ball.true_pos[1] / match.screen_rect.height
+        return min(max(target + self.random.gauss(0, self.error), 0.0), 1.0)
+
+
+class RandomInput(PaddleInput):
+    """
+    Random walk over the screen height, a fuzzing opponent
+    """
+    def __init__(self, step=0.05, seed=None):
+        self.step = step
+        self.random = random.Random(seed)
+        self.position = 0.5
+
+    def read(self, match) -> float:
+        self.position = min(max(self.position + self.random.uniform(-self.step, self.step), 0.0), 1.0)
+        return self.position
+
+
+def run_match(match, right_input, left_input=None, step_duration=1.0 / 240, steps_per_read=4, max_time=600.0) -> dict:
+    """
+    Play `match` until somebody wins or `max_time` seconds of game time passed, as fast as possible.
+    Inputs are read every `steps_per_read` steps, i.e. once per frame at 60 fps with the default 240 Hz physics.
+    """
+    rallies = 0
+    bounces = 0
+    while match.winner is None and match.time < max_time:
+        if match.steps % steps_per_read == 0:
+            match.set_position("right", right_input.read(match))
+            if left_input is not None:
+                match.set_position("left", left_input.read(match))
+        for event in match.step(step_duration):
+            if event == BOUNCE:
+                bounces += 1
+            elif event == SCORE:
+                rallies += 1
+    return {
+        "score": list(match.score),
+        "winner": match.winner,
+        "game_seconds": match.time,
+        "steps": match.steps,
+        "rallies": rallies,
+        "bounces": bounces,
+    }
@@ -0,0 +1,78 @@
+import numpy as np
+import pygame as pg
+
+
+class SpatialHash:
+    """
+    Uniform grid over `bounds` for finding which of many boxes may touch. Objects are sorted by the cell
+    their center lies in, so every cell is a slice of `order`. Boxes up to `cell_size` wide can only touch
+    boxes in their own or a neighbouring cell.
+
+    Call `rebuild` with the centers after every move, then `pairs` and `query` list candidates for an exact test.
+    """
+    def __init__(self, bounds, cell_size):
+        self.bounds = pg.Rect(bounds)
+        self.cell_size = cell_size
+        self.origin = np.array(self.bounds.topleft, dtype=np.float64)
+        self.cols = self.bounds.width // cell_size + 1
+        self.rows = self.bounds.height // cell_size + 1
+        self.order = np.zeros(0, dtype=np.intp)
+        self.cells = np.zeros((0, 2), dtype=np.intp)
+        self.cell_start = np.zeros(self.cols * self.rows + 1, dtype=np.intp)
+
+    def rebuild(self, centers):
+        cells = ((centers - self.origin) // self.cell_size).astype(np.intp)
+        np.clip(cells, 0, (self.cols - 1, self.rows - 1), out=cells)
+        keys = cells[:, 1] * self.cols + cells[:, 0]
+
+        # Most objects stay in their cell from one step to the next. Last step's order is then nearly
+        # sorted already, which the stable sort (timsort) finishes in close to linear time.
+        if len(self.order) != len(centers):
+            self.order = np.arange(len(centers))
+        self.order = self.order[np.argsort(keys[self.order], kind="stable")]
+        self.cells = cells
+        self.cell_start = np.searchsorted(keys[self.order], np.arange(self.cols * self.rows + 1))
+
+    def pairs(self):
+        """
+        Indices (first, second) of every pair of objects in the same or neighbouring cells, each pair once
+        """
+        n = len(self.order)
+        ranks = np.arange(n)
+        cells = self.cells[self.order]
+        keys = cells[:, 1] * self.cols + cells[:, 0]
+
+        # Later objects of the same cell, then the cells to the right and in the row below
+        starts = [ranks + 1]
+        ends = [self.cell_start[keys + 1]]
+        for dx, dy in ((1, 0), (-1, 1), (0, 1), (1, 1)):
+            x = cells[:, 0] + dx
+            y = cells[:, 1] + dy
+            inside = (x >= 0) & (x < self.cols) & (y < self.rows)
+            neighbour = np.where(inside, y * self.cols + x, 0)
+            starts.append(np.where(inside, self.cell_start[neighbour], 0))
+            ends.append(np.where(inside, self.cell_start[neighbour + 1], 0))
+
+        counts = np.maximum(np.concatenate(ends) - np.concatenate(starts), 0)
+        first = np.repeat(np.tile(ranks, len(starts)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        second = np.repeat(np.concatenate(starts), counts) + offsets
+        return self.order[first], self.order[second]
+
+    def query(self, rect):
+        """
+        Indices of the objects whose boxes may touch `rect`
+        """
+        rect = pg.Rect(rect).inflate(2 * self.cell_size, 2 * self.cell_size)
+        x0, y0 = ((np.array(rect.topleft) - self.origin) // self.cell_size).astype(np.intp)
+        x1, y1 = ((np.array(rect.bottomright) - self.origin) // self.cell_size).astype(np.intp)
+        x0, x1 = max(x0, 0), min(x1, self.cols - 1)
+        y0, y1 = max(y0, 0), min(y1, self.rows - 1)
+        if x0 > x1 or y0 > y1:
+            return np.zeros(0, dtype=np.intp)
+
+        # The cells of one row are contiguous in the sort order
+        rows = np.arange(y0, y1 + 1) * self.cols
+        starts = self.cell_start[rows + x0]
+        ends = self.cell_start[rows + x1 + 1]
+        return self.order[np.concatenate([np.arange(start, end) for start, end in zip(starts, ends)])]
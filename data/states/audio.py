@@ -81,10 +81,9 @@ class Audio(tools.States):
             screen.blit(opt[0],opt[1])
         
     def pre_render_listings(self):
-        listing_text = tools.Font.load('impact.ttf', 25)
         rendered_msg = {"des":[],"sel":[]}
         for listing in self.listings:
-            text = listing_text.render(listing, 1, (255,255,255))
+            text = tools.text_cache.render(listing, 'impact.ttf', 25, (255,255,255))
             text_rect = text.get_rect()
             rendered_msg["des"].append((text, text_rect))
         self.rendered_listing = rendered_msg
@@ -1,27 +1,41 @@
 import pygame as pg
-from .. import ball as ball_
-from .. import paddle
+import time
 from .. import tools
-from .. import AI
-from .. import audio_input
+from .. import audio_engine
+from .. import simulation
+from .. import telemetry
 
 MIN_PITCH_CONFIDENCE = 0.825
-WINNING_SCORE = 9
-BASE_PADDLE_SPEED = 200
 
 
 class Classic(tools.States):
-    def __init__(self, screen_rect, difficulty, audio_device_name_1, audio_device_name_2):
+    def __init__(self, screen_rect, difficulty, audio_device_name_1, audio_device_name_2, audio_settings=None,
+                 shared_audio=None):
+        """
+        `shared_audio` is another Classic whose microphones this game plays with instead of opening its own,
+        the device names and audio settings are then ignored. Only one of them may be entered at a time.
+        """
         tools.States.__init__(self)
+        audio_settings = dict(audio_settings or {})
+        # Smoothing filter per player slot, the remaining settings apply to every microphone
+        player_filters = audio_settings.pop("pitch_filters", [])
+        telemetry_path = audio_settings.pop("telemetry_path", None)
 
-        # Select number of players
+        # Devices beyond the first two, every further player joins the right or left team in turn
+        extra_device_names = audio_settings.pop("extra_device_names", [])
+
+        device_names = [audio_device_name_1]
         if audio_device_name_2 is not None:
-            self.num_players = 2
+            device_names.append(audio_device_name_2)
+        device_names.extend(extra_device_names)
+
+        # Select number of players. A multichannel device provides one player per channel.
+        if shared_audio is not None:
+            self.num_players = shared_audio.num_players
         else:
-            self.num_players = 1
+            self.num_players = len(device_names) * audio_settings.get("num_channels", 1)
 
         self.screen_rect = screen_rect
-        self.score_text, self.score_rect = self.make_text("SCOREBOARD_PLACEHOLDER", (255, 255, 255), (screen_rect.centerx, 100), 50)
         self.pause_text, self.pause_rect = self.make_text("PAUSED", (255, 255, 255), screen_rect.center, 50)
 
         self.cover = pg.Surface((screen_rect.width, screen_rect.height))
@@ -31,86 +45,61 @@ class Classic(tools.States):
         # game specific content
         self.bg_color = (0, 0, 0)
         self.pause = False
-        self.score = [0, 0]
-
-        paddle_width = 10
-        paddle_height = 100
-        paddle_y = self.screen_rect.centery - (paddle_height // 2)
-        paddle_speed = BASE_PADDLE_SPEED
-        paddle_left_speed = paddle_speed if self.num_players == 2 else paddle_speed / 1.7
-        padding = 25  # padding from wall
-        pad_right = screen_rect.width - paddle_width - padding
-
-        self.ball = ball_.Ball(self.screen_rect, 10, 10, (0, 255, 0))
-
-        self.paddle_left = paddle.Paddle(
-            "left",
-            padding,
-            paddle_y,
-            paddle_width,
-            paddle_height,
-            paddle_left_speed,
-            (150, 150, 150)
-        )
-
-        self.paddle_right = paddle.Paddle(
-            "right",
-            pad_right,
-            paddle_y,
-            paddle_width,
-            paddle_height,
-            paddle_speed,
-            (150, 150, 150)
-        )
-
-        if self.num_players == 1:
-            self.ai = AI.AIPaddle(self.screen_rect, self.ball.rect, difficulty)
-
-        self.paddle_right.update_desired_y((screen_rect.bottom - screen_rect.top) / 2)
-        self.paddle_left.update_desired_y((screen_rect.bottom - screen_rect.top) / 2)
-
-        # Audio setup
+
+        # The rules live in a headless match, this state draws it, plays its sounds and feeds it the microphones
+        self.match = simulation.Match(screen_rect, difficulty, self.num_players)
+        self.ball = self.match.ball
+        self.paddle_left = self.match.paddle_left
+        self.paddle_right = self.match.paddle_right
+        self.ai = self.match.ai
+        self.score = self.match.score
+        self.update_score_text()
+
+        self.bounce = tools.Sound('boing.wav')
+        self.bounce.sound.set_volume(.5)
+        self.gutter = tools.Sound('whoosh.wav')
+        self.gutter.sound.set_volume(.1)
+
+        if shared_audio is not None:
+            self.owns_audio = False
+            self.audio_engine = shared_audio.audio_engine
+            self.mic_controllers = shared_audio.mic_controllers
+            self.player_inputs = shared_audio.player_inputs
+            self.telemetry_log = shared_audio.telemetry_log
+            return
+
+        # Audio setup. The capture chunk size and analysis window may be replaced by a per-device calibration.
         sample_rate = 44100
         buffer_size = 1024
         pitch_tolerance = 0.8
         min_confidence = 0.0
-
-        self.mic_controller_1 = audio_input.MicController(
-            device_name=audio_device_name_1,
-            sample_rate=sample_rate,
-            buffer_size=buffer_size,
-            pitch_tolerance=pitch_tolerance,
-            min_confidence=min_confidence,
-        )
-
-        self.mic_controller_2 = None
-        if self.num_players == 2:
-            self.mic_controller_2 = audio_input.MicController(
-                device_name=audio_device_name_2,
-                sample_rate=sample_rate,
-                buffer_size=buffer_size,
-                pitch_tolerance=pitch_tolerance,
-                min_confidence=min_confidence,
-            )
-
-    def process_audio_input(self, mic_controller):
-        # Top is 0, bottom grows larger. Invert the incoming pitch
-        normalized_pitch = mic_controller.get_normalized_position()
-        if normalized_pitch is not None and normalized_pitch >= 0:
-            # top coordinate is 0, bottom coordinate is self.screen_rect.bottom
-            max_pos = self.screen_rect.bottom
-
-            # Invert position: 1 means top (y-coordinate is 0), 0 means bottom (y-coordinate is screen height)
-            inverted_pitch = (1.0 - normalized_pitch)
-            abs_pos = inverted_pitch * max_pos
-            return abs_pos
-
-        return None
+        self.owns_audio = True
+        self.audio_engine = audio_engine.AudioEngine(
+            device_names, sample_rate, buffer_size, pitch_tolerance, min_confidence, **audio_settings)
+        self.mic_controllers = self.audio_engine.mic_controllers
+
+        # One entry per player slot: even slots play on the right, odd slots on the left
+        self.player_inputs = self.audio_engine.channels
+        for player_input, pitch_filter in zip(self.player_inputs, player_filters):
+            if pitch_filter:
+                player_input.set_pitch_filter(pitch_filter)
+
+        # Audio telemetry is appended to a JSONL file every few seconds and on F2
+        self.telemetry_log = None
+        if telemetry_path:
+            self.telemetry_log = telemetry.TelemetryLog(telemetry_path, self.mic_controllers)
+
+    def team_position(self, positions):
+        # A team's paddle follows the mean of its players that currently have a pitch
+        active = positions[positions >= 0]
+        if len(active):
+            return active.mean()
+        return -1
 
     def reset(self):
         self.pause = False
-        self.score = [0, 0]
-        self.ball.set_ball()
+        self.match.reset()
+        self.update_score_text()
 
     def get_event(self, event, keys):
         if event.type == pg.QUIT:
@@ -123,6 +112,8 @@ class Classic(tools.States):
                 self.reset()
             elif event.key == self.controller_dict['pause']:
                 self.pause = not self.pause
+            elif event.key == pg.K_F2 and self.telemetry_log is not None:
+                self.telemetry_log.export()
         elif event.type == self.background_music.track_end:
             self.background_music.track = (
                 self.background_music.track + 1
@@ -131,82 +122,78 @@ class Classic(tools.States):
                 self.background_music.tracks[self.background_music.track])
             pg.mixer.music.play()
 
-    def movement(self, keys, time_delta) -> bool:
-        if self.num_players == 1:
-            if self.ai.move_up:
-                self.paddle_left.move_up(time_delta)
-            if self.ai.move_down:
-                self.paddle_left.move_down(time_delta)
-
+    def movement(self, keys, time_delta):
         if keys[pg.K_UP] or keys[pg.K_w]:
-            self.paddle_right.move_up(time_delta)
+            self.match.nudge("right", -1, time_delta)
         if keys[pg.K_DOWN] or keys[pg.K_s]:
-            self.paddle_right.move_down(time_delta)
+            self.match.nudge("right", 1, time_delta)
 
     def update(self, time_delta, keys):
-        global WINNING_SCORE
         if not self.pause:
-            # Update AI
-            if self.num_players == 1:
-                self.ai.update(self.ball.rect, self.ball, self.paddle_left.rect)
-
-            self.score_text, self.score_rect = self.make_text('{}:{}'.format(self.score[0], self.score[1]), (255, 255, 255), (self.screen_rect.centerx, 25), 50)
-
-            # Keep the paddles inside the screen
-            self.paddle_left.update(self.screen_rect)
-            self.paddle_right.update(self.screen_rect)
+            # This frame shows up on screen about one frame from now, predicting filters aim for that moment
+            present_time = time.perf_counter() + time_delta
 
-            hit_side = self.ball.update(self.paddle_left.rect, self.paddle_right.rect)
+            # Audio is read once per frame, the physics steps in between chase the latest targets
+            positions = self.audio_engine.read_positions(present_time)
+            if self.num_players > 1:
+                self.match.set_position("left", self.team_position(positions[1::2]))
+            self.match.set_position("right", self.team_position(positions[0::2]))
 
-            # Adjust score. TODO - Do something interesting on winning
-            if hit_side:
-                self.adjust_score(hit_side)
-                for i in range(0, len(self.score)):
-                    if self.score[i] >= WINNING_SCORE:
-                        pass
-
-            self.movement(keys, time_delta)
-
-            if self.num_players == 2:
-                lpos = self.process_audio_input(self.mic_controller_2)
-                if lpos:
-                    self.paddle_left.update_desired_y(lpos)
+        pg.mouse.set_visible(False)
 
-            rpos = self.process_audio_input(self.mic_controller_1)
-            if rpos:
-                self.paddle_right.update_desired_y(rpos)
-                # print(f"rpos: abs = {rpos}, rel = {rpos / self.screen_rect.bottom}")
+        if self.telemetry_log is not None:
+            self.telemetry_log.poll()
 
-            # Update the paddles positions
-            self.paddle_right.update_pos(time_delta)
-            self.paddle_left.update_pos(time_delta)
+    def step(self, time_delta, keys):
+        if self.pause:
+            return
 
-        else:
-            self.pause_text, self.pause_rect = self.make_text("PAUSED", (255, 255, 255), self.screen_rect.center, 50)
-        pg.mouse.set_visible(False)
+        self.movement(keys, time_delta)
+        for event in self.match.step(time_delta):
+            self.match_event(event)
 
-        if self.num_players == 1:
-            self.ai.reset()
+    def match_event(self, event):
+        if event == simulation.BOUNCE:
+            self.bounce.sound.play()
+        elif event == simulation.GUTTER:
+            self.gutter.sound.play()
+        elif event == simulation.SCORE:
+            self.update_score_text()
+        # TODO - Do something interesting on simulation.WIN
 
     def render(self, screen):
-        screen.fill(self.bg_color)
-        screen.blit(self.score_text, self.score_rect)
-        self.ball.render(screen)
-        self.paddle_left.render(screen)
-        self.paddle_right.render(screen)
+        self.render_sprites(screen, [
+            (self.score_text, self.score_rect),
+            (self.ball.surface, self.ball.interpolated_rect(self.interpolation)),
+            (self.paddle_left.surface, self.paddle_left.interpolated_rect(self.interpolation)),
+            (self.paddle_right.surface, self.paddle_right.interpolated_rect(self.interpolation)),
+        ])
         if self.pause:
             screen.blit(self.cover, (0, 0))
             screen.blit(self.pause_text, self.pause_rect)
+            # The cover spans the whole screen, repaint everything once the game resumes
+            self.invalidate()
+            self.dirty_rects = None
 
-    def adjust_score(self, hit_side):
-        if hit_side == -1:
-            self.score[1] += 1
-        elif hit_side == 1:
-            self.score[0] += 1
+    def update_score_text(self):
+        # Rendered only when the score changes, not every frame
+        self.score_text, self.score_rect = self.make_text('{}:{}'.format(self.score[0], self.score[1]), (255, 255, 255), (self.screen_rect.centerx, 25), 50)
 
     def cleanup(self):
         pg.mixer.music.stop()
         self.background_music.setup(self.background_music_volume)
+        self.audio_engine.stop()
+        if self.telemetry_log is not None:
+            self.telemetry_log.export()
 
     def entry(self):
+        self.invalidate()
         pg.mixer.music.play()
+        self.audio_engine.start()
+
+    def close(self):
+        if not self.owns_audio:
+            return
+        if self.telemetry_log is not None:
+            self.telemetry_log.export()
+        self.audio_engine.close()
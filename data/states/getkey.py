@@ -29,7 +29,6 @@ class GetKey(tools.States):
         self.mouse_menu_click(event)
 
     def update(self, now, keys):
-        self.title, self.title_rect = self.make_text('Change key binding for "{}"'.format(self.action), (75,75,75), (self.screen_rect.centerx, 75), 50)
         #pg.mouse.set_visible(True)
         self.mouse_hover_sound()
 
@@ -37,14 +36,9 @@ class GetKey(tools.States):
         screen.fill(self.bg_color)
         screen.blit(self.title,self.title_rect)
         
-    def make_text(self,message,color,center,size):
-        font = tools.Font.load('impact.ttf', size)
-        text = font.render(message,True,color)
-        rect = text.get_rect(center=center)
-        return text,rect
-        
     def cleanup(self):
         pass
 
     def entry(self):
-        pass
+        # The action is set before this state is entered, the title only changes with it
+        self.title, self.title_rect = self.make_text('Change key binding for "{}"'.format(self.action), (75,75,75), (self.screen_rect.centerx, 75), 50)
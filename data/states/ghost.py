@@ -1,61 +1,51 @@
-
 from . import classic
-from .. import ball as ball_
-import random
-import pygame as pg
+from .. import ball_system
+from .. import simulation
+
+# Every point serves this many decoy balls, at most MAX_GHOST_BALLS stay on screen
+GHOST_BALLS_PER_POINT = 16
+MAX_GHOST_BALLS = 512
+# Decoys bounce off each other as well as off the walls and paddles
+GHOST_BALL_COLLISIONS = True
+
 
 class Ghost(classic.Classic):
-    def __init__(self, screen_rect, difficulty):
-        classic.Classic.__init__(self, screen_rect, difficulty)
-        self.fake_balls = []
-        
-    def add_fake_ball(self):
-        color = (random.randint(0,255), random.randint(0,255), random.randint(0,255))
-        speed = random.randint(3,10)
-        ball = ball_.Ball(self.screen_rect, 10,10, color, menu=True, speed=speed)
-        self.fake_balls.append(ball)
-        
-    def adjust_score(self, hit_side):
-        if hit_side == -1:
-            self.add_fake_ball()
-            self.score[1] += 1
-        elif hit_side == 1:
-            self.add_fake_ball()
-            self.score[0] += 1
-            
+    """
+    Classic game where every point releases a burst of decoy balls that bounce around the real one.
+    Plays with the microphones of `classic_state`.
+    """
+    def __init__(self, screen_rect, difficulty, classic_state):
+        classic.Classic.__init__(self, screen_rect, difficulty, None, None, shared_audio=classic_state)
+        self.fake_balls = ball_system.BallSystem(
+            self.screen_rect, 10, MAX_GHOST_BALLS, collide_balls=GHOST_BALL_COLLISIONS)
+
+    def reset(self):
+        classic.Classic.reset(self)
+        self.fake_balls.clear()
+
+    def match_event(self, event):
+        classic.Classic.match_event(self, event)
+        if event == simulation.SCORE:
+            self.fake_balls.add(GHOST_BALLS_PER_POINT, speed_range=(3, 10))
+
+    def step(self, time_delta, keys):
+        classic.Classic.step(self, time_delta, keys)
+        if not self.pause:
+            self.fake_balls.step(time_delta, (self.paddle_left.rect, self.paddle_right.rect))
+
     def render(self, screen):
+        # Hundreds of balls change every frame, drawing everything is cheaper than tracking their regions
         screen.fill(self.bg_color)
         screen.blit(self.score_text, self.score_rect)
-        self.ball.render(screen)
-        for ball in self.fake_balls:
-            ball.render(screen)
-        self.paddle_left.render(screen)
-        self.paddle_right.render(screen)
+        self.fake_balls.draw(screen, self.interpolation)
+        self.ball.render(screen, self.interpolation)
+        self.paddle_left.render(screen, self.interpolation)
+        self.paddle_right.render(screen, self.interpolation)
         if self.pause:
-            screen.blit(self.cover,(0,0))
+            screen.blit(self.cover, (0, 0))
             screen.blit(self.pause_text, self.pause_rect)
-            
-    def update(self, now, keys):
-        if not self.pause:
-            self.ai.update(self.ball.rect, self.ball, self.paddle_left.rect)
-            self.score_text, self.score_rect = self.make_text('{}:{}'.format(self.score[0], self.score[1]),
-                (255,255,255), (self.screen_rect.centerx,25), 50)
-            self.paddle_left.update(self.screen_rect)
-            self.paddle_right.update(self.screen_rect)
-            hit_side = self.ball.update(self.paddle_left.rect, self.paddle_right.rect)
-            for ball in self.fake_balls:
-                ball.update(self.bogus_rect, self.bogus_rect)
-            if hit_side:
-                self.adjust_score(hit_side)
-            self.movement(keys)
-        else:
-            self.pause_text, self.pause_rect = self.make_text("PAUSED",
-                (255,255,255), self.screen_rect.center, 50)
-        pg.mouse.set_visible(False)
-        self.ai.reset()
-        
+        self.dirty_rects = None
+
     def cleanup(self):
-        pg.mixer.music.stop()
-        self.background_music.setup(self.background_music_volume)
-        self.fake_balls = []
-        
+        classic.Classic.cleanup(self)
+        self.fake_balls.clear()
@@ -0,0 +1,92 @@
+import pygame as pg
+import numpy as np
+from .. import tools
+
+PHASE_SECONDS = 3.0
+PHASES = [("low", "Sing your lowest comfortable note"), ("high", "Sing your highest comfortable note")]
+MIN_CALIBRATION_PITCHES = 10
+
+
+class RangeCalibration(tools.States):
+    """
+    Short "sing low / sing high" screen that sets the pitch range of every player before a classic game
+    """
+    def __init__(self, screen_rect, classic):
+        tools.States.__init__(self)
+        self.screen_rect = screen_rect
+        self.classic = classic
+        self.next = 'CLASSIC'
+        self.title, self.title_rect = self.make_text('Voice calibration', (75, 75, 75), (self.screen_rect.centerx, 75), 100)
+        self.bar_rect = pg.Rect(0, 0, screen_rect.width // 2, 20)
+        self.bar_rect.center = (screen_rect.centerx, screen_rect.centery + 50)
+        self.reset()
+
+    def reset(self):
+        self.phase = 0
+        self.timer = 0.0
+        num_players = len(self.classic.player_inputs)
+        self.sung_pitches = {name: [[] for _ in range(num_players)] for name, _ in PHASES}
+        self.prompt, self.prompt_rect = self.make_text(PHASES[0][1], (255, 255, 255), self.screen_rect.center, 50)
+
+    def get_event(self, event, keys):
+        if event.type == pg.QUIT:
+            self.quit = True
+        elif event.type == pg.KEYDOWN:
+            if event.key == self.controller_dict['back']:
+                self.done = True
+                self.next = 'MENU'
+
+    def update(self, time_delta, keys):
+        pg.mouse.set_visible(False)
+        phase_name = PHASES[self.phase][0]
+        for player, player_input in enumerate(self.classic.player_inputs):
+            player_input.get_normalized_position()
+            self.sung_pitches[phase_name][player].append(player_input.accepted_pitches)
+
+        self.timer += time_delta
+        if self.timer < PHASE_SECONDS:
+            return
+
+        self.timer = 0.0
+        self.phase += 1
+        if self.phase < len(PHASES):
+            self.prompt, self.prompt_rect = self.make_text(PHASES[self.phase][1], (255, 255, 255), self.screen_rect.center, 50)
+            return
+
+        self.apply_ranges()
+        self.next = 'CLASSIC'
+        self.done = True
+
+    def apply_ranges(self):
+        for player, player_input in enumerate(self.classic.player_inputs):
+            low = np.concatenate(self.sung_pitches["low"][player])
+            high = np.concatenate(self.sung_pitches["high"][player])
+            if len(low) < MIN_CALIBRATION_PITCHES or len(high) < MIN_CALIBRATION_PITCHES:
+                print(f"[{player_input.name}] Not enough pitch to calibrate, keeping {player_input.min_pitch:.1f}-{player_input.max_pitch:.1f}")
+                continue
+
+            min_pitch, max_pitch = sorted([float(np.median(low)), float(np.median(high))])
+            if player_input.vocal_range is not None:
+                # Never narrower than the automatic range would allow
+                span = player_input.vocal_range.min_span
+                if max_pitch - min_pitch < span:
+                    center = (min_pitch + max_pitch) / 2
+                    min_pitch, max_pitch = center - span / 2, center + span / 2
+            player_input.set_pitch_range(min_pitch, max_pitch)
+            print(f"[{player_input.name}] Pitch range {min_pitch:.1f}-{max_pitch:.1f}")
+
+    def render(self, screen):
+        screen.fill(self.bg_color)
+        screen.blit(self.title, self.title_rect)
+        screen.blit(self.prompt, self.prompt_rect)
+        progress = self.bar_rect.copy()
+        progress.width = int(self.bar_rect.width * min(self.timer / PHASE_SECONDS, 1.0))
+        pg.draw.rect(screen, (75, 75, 75), self.bar_rect)
+        pg.draw.rect(screen, (200, 230, 0), progress)
+
+    def cleanup(self):
+        self.classic.audio_engine.stop()
+
+    def entry(self):
+        self.reset()
+        self.classic.audio_engine.start()
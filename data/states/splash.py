@@ -15,7 +15,13 @@ class Splash(tools.States):
         self.cover_alpha = 256
         self.alpha_step = 3
 
-        self.image = pg.image.load('resources/graphics/splash_page.png').convert_alpha()
+        # Set by Control, its progress is shown below the text
+        self.warm_up = None
+        self.status = None
+        self.bar_rect = pg.Rect(0, 0, screen_rect.width // 3, 6)
+        self.bar_rect.center = (screen_rect.centerx, screen_rect.bottom - 80)
+
+        self.image = tools.Image.load('splash_page.png').convert_alpha()
         text = ["Ackermann Telegames", "presents"]
         self.rendered_text = self.make_text_list("Fixedsys500c", 50, text,
                                                  (200, 230, 0), 320, 50)
@@ -30,8 +36,7 @@ class Splash(tools.States):
         return rendered_text
 
     def render_font(self, font, size, msg, color=(255, 255, 255)):
-        selected_font = tools.Font.load('impact.ttf', size)
-        return selected_font.render(msg, 1, color)
+        return tools.text_cache.render(msg, 'impact.ttf', size, color)
 
     def update(self, surface, keys):
         pg.mouse.set_visible(False)
@@ -40,12 +45,22 @@ class Splash(tools.States):
         self.cover_alpha = max(self.cover_alpha - self.alpha_step, 0)
         if self.current_time - self.start_time > 1000.0 * self.timeout:
             self.done = True
+        if self.warm_up is not None and self.warm_up.status != self.status:
+            self.status = self.warm_up.status
+            self.status_text, self.status_rect = self.make_text(
+                self.status, (75, 75, 75), (self.screen_rect.centerx, self.bar_rect.top - 25), 25)
 
     def render(self, screen):
         #screen.blit(self.image, (0, 0))
         screen.blit(self.cover, (0, 0))
         for msg in self.rendered_text:
             screen.blit(*msg)
+        if self.status:
+            progress = self.bar_rect.copy()
+            progress.width = int(self.bar_rect.width * self.warm_up.progress)
+            pg.draw.rect(screen, (40, 40, 40), self.bar_rect)
+            pg.draw.rect(screen, (200, 230, 0), progress)
+            screen.blit(self.status_text, self.status_rect)
 
     def get_event(self, event, keys):
         if event.type == pg.QUIT:
@@ -0,0 +1,180 @@
+import bisect
+import json
+import time
+import numpy as np
+
+# Upper bucket edges in milliseconds, the last bucket counts everything slower
+TIME_EDGES_MS = (0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+# Upper bucket edges for numbers of waiting hops
+DEPTH_EDGES = (0, 1, 2, 4, 8, 16, 32, 64)
+
+REJECT_REASONS = ("unvoiced", "too_low", "too_high", "low_confidence")
+
+
+class Histogram(object):
+    """
+    Fixed-bucket histogram, adding a value never allocates
+    """
+    def __init__(self, edges):
+        self.edges = tuple(edges)
+        self.counts = np.zeros(len(self.edges) + 1, dtype=np.int64)
+        self.reset()
+
+    def reset(self):
+        self.counts[:] = 0
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def add(self, value):
+        self.counts[bisect.bisect_left(self.edges, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.maximum:
+            self.maximum = value
+
+    def to_dict(self) -> dict:
+        return {
+            "edges": list(self.edges),
+            "counts": self.counts.tolist(),
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "max": float(self.maximum),
+        }
+
+
+class ChannelTelemetry(object):
+    """
+    Counters of one player's pitch stream, updated by the game loop when it drains the pitch ring
+    """
+    def __init__(self, name):
+        self.name = name
+        self.detector_time = Histogram(TIME_EDGES_MS)
+        self.queue_depth = Histogram(DEPTH_EDGES)
+        self.frame_interval = Histogram(TIME_EDGES_MS)
+        self.rejected = np.zeros(len(REJECT_REASONS), dtype=np.int64)
+        self.reset()
+
+    def reset(self):
+        self.detector_time.reset()
+        self.queue_depth.reset()
+        self.frame_interval.reset()
+        self.rejected[:] = 0
+        self.hops = 0
+        self.accepted = 0
+        self.skipped_hops = 0
+        self.last_hop_index = None
+        self.last_frame_time = None
+
+    def record_drain(self, records, rejections):
+        """
+        Account for the records of one drain and one mask of rejected pitches per entry of REJECT_REASONS
+        """
+        now = time.perf_counter()
+        if self.last_frame_time is not None:
+            self.frame_interval.add(1000 * (now - self.last_frame_time))
+        self.last_frame_time = now
+
+        num_records = len(records)
+        self.queue_depth.add(num_records)
+        if num_records == 0:
+            return
+
+        self.hops += num_records
+        for reason, rejected in enumerate(rejections):
+            self.rejected[reason] += np.count_nonzero(rejected)
+        self.accepted = self.hops - int(self.rejected.sum())
+
+        # Hops the analysis never published, e.g. chunks a worker skipped because it fell behind
+        hop_indices = records["hop_index"]
+        first = self.last_hop_index + 1 if self.last_hop_index is not None else hop_indices[0]
+        self.skipped_hops += int(hop_indices[-1] - first + 1 - num_records)
+        self.last_hop_index = int(hop_indices[-1])
+
+        for analysis_time in records["analysis_time"]:
+            self.detector_time.add(1000 * float(analysis_time))
+
+    def snapshot(self, dropped_records=0) -> dict:
+        return {
+            "name": self.name,
+            "hops": int(self.hops),
+            "accepted": int(self.accepted),
+            "rejected": dict(zip(REJECT_REASONS, self.rejected.tolist())),
+            "skipped_hops": self.skipped_hops,
+            "dropped_records": int(dropped_records),
+            "detector_time_ms": self.detector_time.to_dict(),
+            "queue_depth": self.queue_depth.to_dict(),
+            "frame_interval_ms": self.frame_interval.to_dict(),
+        }
+
+
+class MicTelemetry(object):
+    """
+    Counters of one capture device, updated from the audio callback.
+
+    Callback intervals much longer than a hop mean the device or the OS dropped audio, long callbacks
+    point at the DSP cost, and long frame intervals in the channels at game loop stalls.
+    """
+    def __init__(self, name, hop_duration, channels):
+        self.name = name
+        self.hop_duration = hop_duration
+        self.channels = channels
+        self.callback_interval = Histogram(TIME_EDGES_MS)
+        self.callback_duration = Histogram(TIME_EDGES_MS)
+        self.worker_backlog = Histogram(DEPTH_EDGES)
+        self.reset()
+
+    def reset(self):
+        self.callback_interval.reset()
+        self.callback_duration.reset()
+        self.worker_backlog.reset()
+        self.callbacks = 0
+        self.dropped_chunks = 0
+        self.last_callback_time = None
+
+    def record_callback(self, start, end):
+        if self.last_callback_time is not None:
+            interval = start - self.last_callback_time
+            self.callback_interval.add(1000 * interval)
+            # A gap of several hops means the chunks in between never reached us
+            if interval > 1.5 * self.hop_duration:
+                self.dropped_chunks += int(round(interval / self.hop_duration)) - 1
+        self.last_callback_time = start
+        self.callback_duration.add(1000 * (end - start))
+        self.callbacks += 1
+
+    def snapshot(self, dropped_records=None) -> dict:
+        dropped_records = dropped_records or [0] * len(self.channels)
+        return {
+            "time": time.time(),
+            "device": self.name,
+            "hop_ms": 1000 * self.hop_duration,
+            "callbacks": self.callbacks,
+            "dropped_chunks": self.dropped_chunks,
+            "callback_interval_ms": self.callback_interval.to_dict(),
+            "callback_duration_ms": self.callback_duration.to_dict(),
+            "worker_backlog": self.worker_backlog.to_dict(),
+            "channels": [channel.snapshot(dropped) for channel, dropped in zip(self.channels, dropped_records)],
+        }
+
+
+class TelemetryLog(object):
+    """
+    Appends one JSON line per microphone to `path` every `interval` seconds, or whenever `export` is called
+    """
+    def __init__(self, path, mic_controllers, interval=5.0):
+        self.path = path
+        self.mic_controllers = mic_controllers
+        self.interval = interval
+        self.last_export = time.perf_counter()
+
+    def poll(self):
+        now = time.perf_counter()
+        if now - self.last_export >= self.interval:
+            self.export()
+
+    def export(self):
+        self.last_export = time.perf_counter()
+        with open(self.path, "a") as f:
+            for mic_controller in self.mic_controllers:
+                f.write(json.dumps(mic_controller.get_telemetry()) + "\n")
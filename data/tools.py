@@ -4,6 +4,11 @@ import pygame as pg
 import os
 import shutil
 import random
+import collections
+import threading
+
+# Speeds of balls and paddles were tuned per frame at this rate, they are scaled to per second with it
+REFERENCE_FPS = 60
 
 def clean_files():
     '''remove all pyc files and __pycache__ directories in subdirectory'''
@@ -19,39 +24,132 @@ def clean_files():
                 print('removing {}'.format(os.path.abspath(path)))
                 os.remove(path)
                     
+# Font sizes the states render with, opened by preload_assets
+PRELOAD_FONTS = [('impact.ttf', size) for size in (25, 30, 50, 75, 100, 150)]
+
 class Image:
     path = 'resources/graphics'
+    # Decoded once, convert() or convert_alpha() a loaded image instead of drawing on it
+    loaded = {}
     @staticmethod
     def load(filename):
-        p = os.path.join(Image.path, filename)
-        return pg.image.load(os.path.abspath(p))
+        image = Image.loaded.get(filename)
+        if image is None:
+            p = os.path.join(Image.path, filename)
+            image = Image.loaded[filename] = pg.image.load(os.path.abspath(p))
+        return image
+
+# SDL_ttf shares one FreeType library between all fonts: opening and rendering must not overlap across
+# threads. Reentrant, TextCache.render opens fonts while holding it.
+font_lock = threading.RLock()
 
 class Font:
     path = 'resources/fonts'
+    # Opening a TTF is far slower than rendering with it, every (filename, size) is opened once
+    loaded = {}
     @staticmethod
     def load(filename, size):
-        p = os.path.join(Font.path, filename)
-        return pg.font.Font(os.path.abspath(p), size)
+        key = (filename, size)
+        with font_lock:
+            font = Font.loaded.get(key)
+            if font is None:
+                p = os.path.join(Font.path, filename)
+                font = Font.loaded[key] = pg.font.Font(os.path.abspath(p), size)
+        return font
+
+class TextCache:
+    '''
+    Least recently used rendered text surfaces, keyed by (message, font file, size, color, antialias)
+    and bounded by entry count and pixel bytes. Surfaces are shared, never draw on them.
+    States may be built in a background thread, rendering is serialized by font_lock.
+    '''
+    def __init__(self, max_entries=256, max_bytes=16 * 2**20):
+        self.lock = font_lock
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.surfaces = collections.OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, message, filename, size, color, antialias=True):
+        with self.lock:
+            return self._render(message, filename, size, color, antialias)
+
+    def _render(self, message, filename, size, color, antialias):
+        key = (message, filename, size, tuple(color), antialias)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = Font.load(filename, size).render(message, antialias, color)
+        self.surfaces[key] = surface
+        self.bytes += surface.get_bytesize() * surface.get_width() * surface.get_height()
+        while len(self.surfaces) > 1 and (len(self.surfaces) > self.max_entries or self.bytes > self.max_bytes):
+            _, evicted = self.surfaces.popitem(last=False)
+            self.bytes -= evicted.get_bytesize() * evicted.get_width() * evicted.get_height()
+        return surface
+
+    def stats(self):
+        return {"entries": len(self.surfaces), "bytes": self.bytes, "hits": self.hits, "misses": self.misses}
+
+text_cache = TextCache()
+
+def preload_assets():
+    '''load every image, sound, font and the music track list in one pass'''
+    for filename in os.listdir(Image.path):
+        Image.load(filename)
+    for filename in os.listdir(Sound.path):
+        Sound.load(filename)
+    for filename, size in PRELOAD_FONTS:
+        Font.load(filename, size)
+    Music.list_tracks()
 
 class Sound:
+    path = os.path.join('resources', 'sound')
+    # One decoded buffer per file, shared by every Sound of that file. Volumes are shared as well.
+    loaded = {}
     def __init__(self, filename):
-        self.path = os.path.join('resources', 'sound')
-        self.fullpath = os.path.join(self.path, filename)
-        pg.mixer.init(frequency=22050, size=-16, channels=2, buffer=128)
-        self.sound = pg.mixer.Sound(self.fullpath)
+        self.fullpath = os.path.join(Sound.path, filename)
+        self.sound = Sound.load(filename)
+
+    @staticmethod
+    def load(filename):
+        sound = Sound.loaded.get(filename)
+        if sound is None:
+            if not pg.mixer.get_init():
+                pg.mixer.init(frequency=22050, size=-16, channels=2, buffer=128)
+            sound = Sound.loaded[filename] = pg.mixer.Sound(os.path.join(Sound.path, filename))
+        return sound
         
 class Music:
+    path = os.path.join('resources', 'music')
+    # The track list is read once, pg.mixer.music plays one stream for the whole program
+    track_files = None
+    shared = None
     def __init__(self, volume):
-        self.path = os.path.join('resources', 'music')
         self.setup(volume)
 
+    @staticmethod
+    def get(volume):
+        '''the Music every state shares'''
+        if Music.shared is None:
+            Music.shared = Music(volume)
+        return Music.shared
+
+    @staticmethod
+    def list_tracks():
+        if Music.track_files is None:
+            Music.track_files = [os.path.join(Music.path, track) for track in os.listdir(Music.path)]
+        return Music.track_files
         
     def setup(self, volume):
         self.track_end = pg.USEREVENT+1
-        self.tracks = []
+        self.tracks = list(Music.list_tracks())
         self.track = 0
-        for track in os.listdir(self.path):
-            self.tracks.append(os.path.join(self.path, track))
         random.shuffle(self.tracks)
         pg.mixer.music.set_volume(volume)
         pg.mixer.music.set_endevent(self.track_end)
@@ -59,6 +157,48 @@ class Music:
 
 
 
+class SpriteLayer:
+    '''
+    Draws a list of (surface, rect) sprites over a plain background color and returns the screen regions
+    that changed, for pg.display.update. A sprite counts as changed when its surface or rect differ from
+    the last frame: only its old and new rects are repainted, with every sprite that overlaps them. The first frame after invalidate() repaints everything and returns None.
+    '''
+    def __init__(self, bg_color):
+        self.bg_color = bg_color
+        self.previous = []
+        self.full = True
+
+    def invalidate(self):
+        self.full = True
+
+    def draw(self, screen, sprites):
+        if self.full or len(sprites) != len(self.previous):
+            screen.fill(self.bg_color)
+            for surface, rect in sprites:
+                screen.blit(surface, rect)
+            self.previous = [(surface, rect.copy()) for surface, rect in sprites]
+            self.full = False
+            return None
+
+        dirty = []
+        for i, (surface, rect) in enumerate(sprites):
+            previous_surface, previous_rect = self.previous[i]
+            if surface is not previous_surface or rect != previous_rect:
+                dirty.append(previous_rect)
+                dirty.append(rect.copy())
+                self.previous[i] = (surface, dirty[-1])
+
+        # Every region is repainted from the background up, so sprites with alpha are never blended twice
+        for area in dirty:
+            screen.set_clip(area)
+            screen.fill(self.bg_color)
+            for surface, rect in sprites:
+                if rect.colliderect(area):
+                    screen.blit(surface, rect)
+        screen.set_clip(None)
+        return dirty
+
+
 class States:
     def __init__(self):
         self.bogus_rect = pg.Surface([0,0]).get_rect()
@@ -70,12 +210,19 @@ class States:
         self.button_hover = Sound('button_hover.wav')
         self.button_hover.sound.set_volume(self.button_hover_volume)
         self.background_music_volume = .3
-        self.background_music = Music(self.background_music_volume)
+        self.background_music = Music.get(self.background_music_volume)
         self.bg_color = (25,25,25)
         self.timer = 0.0
         self.quit = False
         self.done = False
         self.rendered = None
+        # Fraction of a simulation step between the last simulated state and the frame being rendered
+        self.interpolation = 1.0
+        # Set by Control when only changed regions are pushed to the display, render then reports them in
+        # dirty_rects. None means the whole screen changed.
+        self.use_dirty_rects = False
+        self.dirty_rects = None
+        self.sprite_layer = SpriteLayer(self.bg_color)
         self.next_list = None
         self.last_option = None
         
@@ -111,20 +258,16 @@ class States:
                     break
                     
     def make_text(self,message,color,center,size):
-        font = Font.load('impact.ttf', size)
-        text = font.render(message,True,color)
+        text = text_cache.render(message, 'impact.ttf', size, color)
         rect = text.get_rect(center=center)
         return text,rect
         
     def pre_render_options(self):
-        font_deselect = Font.load('impact.ttf', 50)
-        font_selected = Font.load('impact.ttf', 75)
-
         rendered_msg = {"des":[],"sel":[]}
         for option in self.options:
-            d_rend = font_deselect.render(option, 1, (255,255,255))
+            d_rend = text_cache.render(option, 'impact.ttf', 50, (255,255,255))
             d_rect = d_rend.get_rect()
-            s_rend = font_selected.render(option, 1, (255,0,0))
+            s_rend = text_cache.render(option, 'impact.ttf', 75, (255,0,0))
             s_rect = s_rend.get_rect()
             rendered_msg["des"].append((d_rend,d_rect))
             rendered_msg["sel"].append((s_rend,s_rect))
@@ -154,3 +297,22 @@ class States:
             elif self.selected_index > max_ind:
                 self.selected_index = 0
             self.button_hover.sound.play()
+
+    def invalidate(self):
+        '''the screen no longer shows what this state drew last, the next render has to repaint everything'''
+        self.sprite_layer.invalidate()
+
+    def render_sprites(self, screen, sprites):
+        '''draw (surface, rect) pairs in order and set dirty_rects, see SpriteLayer'''
+        self.sprite_layer.bg_color = self.bg_color
+        if not self.use_dirty_rects:
+            self.sprite_layer.invalidate()
+        self.dirty_rects = self.sprite_layer.draw(screen, sprites)
+
+    def step(self, time_delta, keys):
+        '''advance the simulation by one fixed timestep, called zero or more times per frame by Control.run'''
+        pass
+
+    def close(self):
+        '''release resources held by the state when the program exits'''
+        pass
@@ -0,0 +1,91 @@
+import numpy as np
+
+# Pitches outside of this range (MIDI) are never accepted
+LOWEST_PITCH = 20.0
+HIGHEST_PITCH = 90.0
+
+
+class VocalRange(object):
+    """
+    Streaming estimate of the pitch range a player actually sings in.
+
+    Accepted pitches go into a fixed-bin histogram between LOWEST_PITCH and HIGHEST_PITCH. Older pitches
+    decay exponentially, so the range follows the voice with bounded memory and O(1) work per pitch.
+    The range spans the `low_quantile` to the `high_quantile` of recent pitches, widened to at least
+    `min_span` semitones. It keeps its initial bounds until `min_count` pitches were seen.
+    """
+    def __init__(self, min_pitch=40.0, max_pitch=60.0, low_quantile=0.05, high_quantile=0.95, half_life=1000,
+                 min_span=6.0, min_count=40, bin_width=0.25):
+        self.initial_range = (min_pitch, max_pitch)
+        self.low_quantile = low_quantile
+        self.high_quantile = high_quantile
+        self.min_span = min_span
+        self.min_count = min_count
+        self.bin_width = bin_width
+        self.half_life = half_life
+
+        # Instead of decaying every bin on each pitch, new pitches get an exponentially growing weight
+        self.growth = 2.0 ** (1.0 / half_life)
+        self.num_bins = int(round((HIGHEST_PITCH - LOWEST_PITCH) / bin_width))
+        self.counts = np.zeros(self.num_bins)
+        self.cumulative = np.zeros(self.num_bins)
+        self.reset()
+
+    def reset(self):
+        self.counts[:] = 0
+        self.weight = 1.0
+        self.total = 0.0
+        self.min_pitch, self.max_pitch = self.initial_range
+
+    @property
+    def count(self) -> float:
+        '''number of pitches in the histogram, old ones counting less'''
+        return self.total / self.weight
+
+    def add(self, pitches):
+        """
+        Add a batch of accepted pitches in arrival order and update the range
+        """
+        num_pitches = len(pitches)
+        if num_pitches == 0:
+            return
+
+        weights = self.weight * self.growth ** np.arange(num_pitches)
+        bins = ((np.asarray(pitches) - LOWEST_PITCH) / self.bin_width).astype(np.intp)
+        np.add.at(self.counts, np.clip(bins, 0, self.num_bins - 1), weights)
+        self.total += weights.sum()
+        self.weight *= self.growth ** num_pitches
+
+        # Rescale before the weights overflow
+        if self.weight > 1e12:
+            self.counts /= self.weight
+            self.total /= self.weight
+            self.weight = 1.0
+
+        if self.count >= self.min_count:
+            self.update_range()
+
+    def quantile(self, q) -> float:
+        np.cumsum(self.counts, out=self.cumulative)
+        index = min(int(np.searchsorted(self.cumulative, q * self.total)), self.num_bins - 1)
+        return LOWEST_PITCH + (index + 0.5) * self.bin_width
+
+    def update_range(self):
+        low = self.quantile(self.low_quantile)
+        high = self.quantile(self.high_quantile)
+        if high - low < self.min_span:
+            center = (low + high) / 2
+            low, high = center - self.min_span / 2, center + self.min_span / 2
+        self.min_pitch, self.max_pitch = low, high
+
+    def seed(self, min_pitch, max_pitch):
+        """
+        Start over from a calibrated range, spread over the histogram as if `half_life` pitches were sung in it
+        """
+        self.reset()
+        first = int((min_pitch - LOWEST_PITCH) / self.bin_width)
+        last = int((max_pitch - LOWEST_PITCH) / self.bin_width)
+        first, last = np.clip([first, last], 0, self.num_bins - 1)
+        self.counts[first:last + 1] = self.half_life / (last - first + 1)
+        self.total = float(self.half_life)
+        self.min_pitch, self.max_pitch = min_pitch, max_pitch
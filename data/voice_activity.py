@@ -0,0 +1,61 @@
+import numpy as np
+
+# Spectral flatness is measured where voices have their energy, on at most the newest FLATNESS_FFT_SIZE samples
+FLATNESS_BAND_HZ = (80.0, 4000.0)
+FLATNESS_FFT_SIZE = 512
+
+
+class VoiceActivityGate(object):
+    """
+    Cheap voiced/unvoiced decision per hop and channel, made before the expensive pitch analysis.
+
+    A channel turns voiced once its level exceeds `on_level_db` (dBFS RMS) and its spectrum is tonal,
+    i.e. its spectral flatness is below `on_flatness`. It only turns unvoiced again after
+    `release_hops` hops below `off_level_db` or above `off_flatness`, so a breath or a consonant does
+    not drop the pitch. The spectrum is skipped entirely while every channel is clearly silent.
+    """
+    def __init__(self, hop_size, sample_rate, num_channels=1, on_level_db=-45.0, off_level_db=-50.0,
+                 on_flatness=0.3, off_flatness=0.45, release_hops=3):
+        self.on_level = 10 ** (on_level_db / 20)
+        self.off_level = 10 ** (off_level_db / 20)
+        self.on_flatness = on_flatness
+        self.off_flatness = off_flatness
+        self.release_hops = release_hops
+
+        self.fft_size = min(hop_size, FLATNESS_FFT_SIZE)
+        self.window = np.hanning(self.fft_size).astype(np.float32)
+        frequencies = np.fft.rfftfreq(self.fft_size, 1.0 / sample_rate)
+        self.band = slice(*np.searchsorted(frequencies, FLATNESS_BAND_HZ))
+        self.band_size = self.band.stop - self.band.start
+
+        self.rms = np.zeros(num_channels, dtype=np.float32)
+        self.flatness = np.ones(num_channels, dtype=np.float32)
+        self.voiced = np.zeros(num_channels, dtype=bool)
+        self.quiet_hops = np.zeros(num_channels, dtype=np.int64)
+
+    def reset(self):
+        self.voiced[:] = False
+        self.quiet_hops[:] = 0
+
+    def __call__(self, signals) -> np.ndarray:
+        """
+        Update the decision with one hop of shape (num_channels, hop_size), returns the reused `voiced` array
+        """
+        np.sqrt(np.einsum("ij,ij->i", signals, signals) / signals.shape[1], out=self.rms)
+
+        loud = self.rms >= self.off_level
+        if not loud.any():
+            self.flatness[:] = 1.0
+        else:
+            # Geometric over arithmetic mean of the power spectrum: close to 1 for noise, close to 0 for tones
+            frames = signals[:, -self.fft_size:] * self.window
+            power = np.abs(np.fft.rfft(frames, axis=1)[:, self.band]) ** 2 + 1e-12
+            log_mean = np.log(power).sum(axis=1) / self.band_size
+            self.flatness[:] = np.exp(log_mean) * self.band_size / power.sum(axis=1)
+
+        onset = (self.rms >= self.on_level) & (self.flatness <= self.on_flatness)
+        quiet = ~loud | (self.flatness > self.off_flatness)
+
+        self.quiet_hops[:] = np.where(quiet, self.quiet_hops + 1, 0)
+        self.voiced[:] = onset | (self.voiced & (self.quiet_hops < self.release_hops))
+        return self.voiced
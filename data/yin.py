@@ -0,0 +1,251 @@
+from typing import Tuple
+import numpy as np
+
+# Outer/middle ear weighting used by yinfft, same table as aubio (frequency in Hz, gain in dB)
+YINFFT_FREQS = np.array([
+    0., 20., 25., 31.5, 40., 50., 63., 80., 100., 125.,
+    160., 200., 250., 315., 400., 500., 630., 800., 1000., 1250.,
+    1600., 2000., 2500., 3150., 4000., 5000., 6300., 8000., 9000., 10000.,
+    12500., 15000., 20000., 25100.,
+])
+YINFFT_WEIGHTS_DB = np.array([
+    -75.8, -70.1, -60.8, -52.1, -44.2, -37.5, -31.3, -25.6, -20.9, -16.5,
+    -12.6, -9.60, -7.00, -4.70, -3.00, -1.80, -0.80, -0.20, -0.00, 0.50,
+    1.60, 3.20, 5.40, 7.80, 8.10, 5.30, -2.40, -11.1, -12.8, -12.2,
+    -7.40, -17.8, -17.8, -17.8,
+])
+
+DEFAULT_TOLERANCE = {"yin": 0.15, "yinfft": 0.85}
+
+
+def _fft_supports_out() -> bool:
+    # numpy >= 2.0 can write FFT results into preallocated arrays
+    try:
+        np.fft.rfft(np.zeros(4), out=np.zeros(3, dtype=np.complex128))
+        return True
+    except TypeError:
+        return False
+
+
+FFT_SUPPORTS_OUT = _fft_supports_out()
+
+
+class YinPitch(object):
+    """
+    Vectorized NumPy implementation of the YIN and YINFFT pitch detectors.
+
+    Mirrors `aubio.pitch`: every channel keeps a sliding window of `buf_size` samples that advances
+    by `hop_size` per call. All channels, or any batch of complete frames passed to `detect`,
+    are analysed together. Every intermediate array is allocated once in the constructor.
+    """
+    def __init__(self, method, buf_size, hop_size, sample_rate, num_channels=1, max_frames=None):
+        if method not in DEFAULT_TOLERANCE:
+            raise ValueError(f"Unknown YIN method {method}, expected one of {list(DEFAULT_TOLERANCE)}")
+
+        self.method = method
+        self.buf_size = buf_size
+        self.hop_size = hop_size
+        self.sample_rate = sample_rate
+        self.num_channels = num_channels
+        self.max_frames = max(max_frames or num_channels, num_channels)
+        self.tolerance = DEFAULT_TOLERANCE[method]
+        self.silence = -90.0
+        self.unit = "Hz"
+
+        # Sliding analysis windows, one per channel, kept as a circular history to avoid shifting
+        self.history = np.zeros((num_channels, buf_size), dtype=np.float64)
+        self.position = 0
+        self.windows = np.zeros((num_channels, buf_size), dtype=np.float64)
+
+        if method == "yin":
+            # Difference function over the first half of the window, computed by FFT cross-correlation
+            self.yin_length = buf_size // 2
+            self.fft_size = 2 * buf_size
+            self.frame_energy = np.zeros((self.max_frames, buf_size + 1))
+        else:
+            # Autocorrelation of the weighted, windowed power spectrum
+            self.yin_length = buf_size // 2 + 1
+            self.fft_size = buf_size
+            self.window_function = 0.5 - 0.5 * np.cos(2 * np.pi * np.arange(buf_size) / buf_size)
+            bin_freqs = np.arange(buf_size // 2 + 1) * sample_rate / buf_size
+            self.spectral_weights = 10 ** (0.05 * np.interp(bin_freqs, YINFFT_FREQS, YINFFT_WEIGHTS_DB))
+
+        # Octave errors are likely for short periods
+        self.short_period = int(round(sample_rate / 1300.))
+
+        # Workspaces
+        num_bins = self.fft_size // 2 + 1
+        self.padded = np.zeros((self.max_frames, self.fft_size))
+        self.head = np.zeros((self.max_frames, self.fft_size))
+        self.spectrum = np.zeros((self.max_frames, num_bins), dtype=np.complex128)
+        self.head_spectrum = np.zeros((self.max_frames, num_bins), dtype=np.complex128)
+        self.power = np.zeros((self.max_frames, num_bins))
+        self.correlation = np.zeros((self.max_frames, self.fft_size))
+        self.yin = np.zeros((self.max_frames, self.yin_length))
+        self.cumulative = np.zeros((self.max_frames, self.yin_length - 1))
+        self.below = np.zeros((self.max_frames, self.yin_length - 1), dtype=bool)
+        self.lags = np.arange(1, self.yin_length, dtype=np.float64)
+        self.rows = np.arange(self.max_frames)
+
+        self.pitches = np.zeros(self.max_frames, dtype=np.float32)
+        self.confidences = np.zeros(self.max_frames, dtype=np.float32)
+
+    def set_tolerance(self, tolerance):
+        self.tolerance = tolerance
+
+    def set_silence(self, silence):
+        self.silence = silence
+
+    def set_unit(self, unit):
+        if unit not in ("Hz", "midi"):
+            raise ValueError(f"Unsupported pitch unit {unit}")
+        self.unit = unit
+
+    def __call__(self, signals) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Slide one hop of every channel into its window and analyse all windows.
+        `signals` has shape (num_channels, hop_size).
+        """
+        start = self.position
+        end = start + self.hop_size
+        if end <= self.buf_size:
+            self.history[:, start:end] = signals
+        else:
+            split = self.buf_size - start
+            self.history[:, start:] = signals[:, :split]
+            self.history[:, :end - self.buf_size] = signals[:, split:]
+        self.position = end % self.buf_size
+
+        # Unroll so the oldest sample comes first
+        oldest = self.position
+        self.windows[:, :self.buf_size - oldest] = self.history[:, oldest:]
+        self.windows[:, self.buf_size - oldest:] = self.history[:, :oldest]
+        return self.detect(self.windows)
+
+    def _rfft(self, frames, out):
+        if FFT_SUPPORTS_OUT:
+            return np.fft.rfft(frames, axis=1, out=out)
+        out[:] = np.fft.rfft(frames, axis=1)
+        return out
+
+    def _irfft(self, spectrum, out):
+        if FFT_SUPPORTS_OUT:
+            return np.fft.irfft(spectrum, n=self.fft_size, axis=1, out=out)
+        out[:] = np.fft.irfft(spectrum, n=self.fft_size, axis=1)
+        return out
+
+    def _difference_yin(self, frames, count):
+        padded = self.padded[:count]
+        head = self.head[:count]
+        yin = self.yin[:count]
+        width = self.yin_length
+
+        padded[:, :self.buf_size] = frames
+        head[:, :width] = frames[:, :width]
+
+        # r(tau) = sum_j x[j] * x[j + tau] for the first half of the window
+        spectrum = self._rfft(padded, self.spectrum[:count])
+        head_spectrum = self._rfft(head, self.head_spectrum[:count])
+        np.conjugate(head_spectrum, out=head_spectrum)
+        np.multiply(spectrum, head_spectrum, out=spectrum)
+        correlation = self._irfft(spectrum, self.correlation[:count])
+
+        # Energy of every shifted window from a running sum of squares
+        energy = self.frame_energy[:count]
+        energy[:, 0] = 0
+        np.square(frames, out=energy[:, 1:])
+        np.cumsum(energy, axis=1, out=energy)
+
+        # d(tau) = e(0) + e(tau) - 2 * r(tau)
+        np.subtract(energy[:, width:2 * width], energy[:, :width], out=yin)
+        yin += (energy[:, width] - energy[:, 0])[:, np.newaxis]
+        yin -= 2 * correlation[:, :width]
+
+    def _difference_yinfft(self, frames, count):
+        padded = self.padded[:count]
+        power = self.power[:count]
+        yin = self.yin[:count]
+
+        np.multiply(frames, self.window_function, out=padded)
+        spectrum = self._rfft(padded, self.spectrum[:count])
+
+        # Weighted squared magnitude spectrum
+        np.multiply(spectrum.real, spectrum.real, out=power)
+        power += spectrum.imag ** 2
+        power *= self.spectral_weights
+
+        # Its inverse transform is the autocorrelation, the difference function follows from it
+        correlation = self._irfft(power, self.correlation[:count])
+        correlation *= self.fft_size
+        total = 2 * power.sum(axis=1)
+        np.subtract(total[:, np.newaxis], correlation[:, :self.yin_length], out=yin)
+
+    def detect(self, frames) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Analyse complete frames of shape (n, buf_size) with n <= max_frames.
+        Returns pitch and confidence per frame; both arrays are reused by the next call.
+        """
+        count = frames.shape[0]
+        yin = self.yin[:count]
+        cumulative = self.cumulative[:count]
+        rows = self.rows[:count]
+
+        if self.method == "yin":
+            self._difference_yin(frames, count)
+        else:
+            self._difference_yinfft(frames, count)
+
+        # Cumulative mean normalized difference
+        np.cumsum(yin[:, 1:], axis=1, out=cumulative)
+        cumulative[cumulative == 0] = np.inf
+        yin[:, 1:] *= self.lags
+        yin[:, 1:] /= cumulative
+        yin[:, 0] = 1
+
+        if self.method == "yin":
+            # First dip below the threshold that is a local minimum
+            below = self.below[:count]
+            np.less(yin[:, 1:-1], self.tolerance, out=below[:, :-1])
+            below[:, :-1] &= yin[:, 1:-1] < yin[:, 2:]
+            below[:, -1] = False
+            found = below.any(axis=1)
+            peak = np.where(found, below.argmax(axis=1) + 1, 0)
+        else:
+            # Global minimum, with a check against octave doubling for short periods
+            peak = yin.argmin(axis=1)
+            found = yin[rows, peak] < self.tolerance
+            half = np.floor(peak / 2 + .5).astype(int)
+            use_half = (peak <= self.short_period) & (yin[rows, half] < self.tolerance)
+            peak = np.where(found, np.where(use_half, half, peak), 0)
+
+        period = self._quadratic_peak_pos(yin, peak, rows)
+
+        pitches = self.pitches[:count]
+        confidences = self.confidences[:count]
+        confidences[:] = 1 - yin[rows, peak]
+        with np.errstate(divide="ignore"):
+            pitches[:] = np.where(found & (period > 0), self.sample_rate / np.maximum(period, 1e-9), 0)
+
+        # Ignore frames below the silence threshold
+        level = 10 * np.log10(np.mean(np.square(frames), axis=1) + 1e-20)
+        pitches[level < self.silence] = 0
+
+        if self.unit == "midi":
+            valid = pitches >= 2
+            pitches[valid] = 12 * np.log2(pitches[valid] / 440.) + 69
+            pitches[~valid] = 0
+
+        return pitches, confidences
+
+    def _quadratic_peak_pos(self, yin, peak, rows) -> np.ndarray:
+        """
+        Refine integer minima by fitting a parabola through the three neighbouring values
+        """
+        inner = (peak > 0) & (peak < self.yin_length - 1)
+        left = yin[rows, np.maximum(peak - 1, 0)]
+        center = yin[rows, peak]
+        right = yin[rows, np.minimum(peak + 1, self.yin_length - 1)]
+        curvature = left - 2 * center + right
+        offset = np.zeros(len(peak))
+        np.divide(left - right, 2 * curvature, out=offset, where=inner & (curvature != 0))
+        return peak + offset
@@ -2,6 +2,7 @@
 
 import pygame as pg
 from data.main import main
+from data.pitch_filters import make_pitch_filter
 import data.tools
 import argparse
 import sys
@@ -34,6 +35,17 @@ parser.add_argument(
     metavar=('WIDTH', 'HEIGHT'),
     help='set window size to WIDTH HEIGHT, defualt is 800 600')
 
+parser.add_argument(
+    '--fps',
+    type=int,
+    default=60,
+    help="Frames rendered per second, the game physics always run at 240 steps per second, default is 60")
+
+parser.add_argument(
+    '--dirty_rects',
+    action='store_true',
+    help="Update only the screen regions that changed each frame instead of the whole window, for slow machines")
+
 parser.add_argument(
     '-1',
     '--audio_device_name_1',
@@ -48,11 +60,94 @@ parser.add_argument(
     # default="Sony SingStar USBMIC Analog Stereo (3)",
     help="(Optional): Audio device name of left player")
 
+parser.add_argument(
+    '-p',
+    '--players',
+    nargs='+',
+    default=[],
+    metavar='DEVICE',
+    help="(Optional): Audio device names of further players, they join the right and left team in turn, e.g. for 2v2")
+
+parser.add_argument(
+    '-m',
+    '--multichannel',
+    action='store_true',
+    help="Open the first audio device once in stereo: channel 1 is the right player, channel 2 the left player")
+
+parser.add_argument(
+    '-i',
+    '--capture_source',
+    default='sdl',
+    help="where CAPTURE_SOURCE is sdl (microphones), file:<path to .wav, .npy or recorded .samples> or synthetic:<sine, glide, vibrato, noise>, default is sdl")
+
+parser.add_argument(
+    '-b',
+    '--pitch_backend',
+    default='aubio',
+    help="where PITCH_BACKEND is one of the strings [aubio, numpy], set the pitch detection implementation, default is aubio")
+
+parser.add_argument(
+    '-l',
+    '--calibrate_latency',
+    action='store_true',
+    help="Probe the lowest latency capture settings for each audio device, cached in ~/.sing_pong")
+
+parser.add_argument(
+    '-w',
+    '--pitch_workers',
+    nargs='?',
+    type=int,
+    const=0,
+    metavar='NUM_WORKERS',
+    help="Run pitch detection in a pool of NUM_WORKERS processes shared by all microphones, "
+         "default is one per microphone up to the number of cores minus one")
+
+parser.add_argument(
+    '--pitch_filter_1',
+    default='moving_average',
+    help="Pitch smoothing of the right player: moving_average[:window], median[:window], ema[:alpha], "
+         "one_euro[:min_cutoff,beta,d_cutoff], kalman[:acceleration_noise,measurement_noise], default is moving_average")
+
+parser.add_argument(
+    '--pitch_filter_2',
+    default='moving_average',
+    help="Pitch smoothing of the left player, same format as --pitch_filter_1")
+
+parser.add_argument(
+    '-t',
+    '--telemetry',
+    metavar='PATH',
+    help="Append audio timing, drop and rejection counters of every microphone as JSON lines to PATH every 5 seconds and on F2")
+
+parser.add_argument(
+    '-r',
+    '--record',
+    metavar='DIR',
+    help="Record the raw samples and pitch records of every player into memory-mapped files in DIR")
+
+parser.add_argument(
+    '--decimation',
+    type=int,
+    default=1,
+    choices=[1, 2, 4, 8],
+    help="Low-pass filter and downsample the microphone signal by this factor before pitch detection, default is 1")
+
+parser.add_argument(
+    '--no_voice_gate',
+    action='store_true',
+    help="Run pitch detection on every hop instead of skipping silence and noise")
+
+parser.add_argument(
+    '--fixed_range',
+    action='store_true',
+    help="Map MIDI pitches 40 to 60 to the screen height instead of adapting the range to each voice")
+
 args = vars(parser.parse_args())
 
 if __name__ == '__main__':
     accepted_difficulty = ['hard', 'medium', 'easy']
     size = audio_device_name_1 = audio_device_name_2 = None
+    audio_settings = {}
 
     if args['difficulty']:
         if args['difficulty'].lower() in accepted_difficulty:
@@ -78,9 +173,69 @@ if __name__ == '__main__':
         audio_device_name_2 = args["audio_device_name_2"]
         print('audio device name of left player: ', audio_device_name_2)
 
+    if args["players"]:
+        if not audio_device_name_2:
+            print("Further players need a second audio device, specify it with -2 first.")
+            exit(-1)
+        audio_settings["extra_device_names"] = args["players"]
+        print('audio device names of further players: ', args["players"])
+
+    if args["multichannel"]:
+        if audio_device_name_2:
+            print("Multichannel capture uses a single audio device, do not specify a second one.")
+            exit(-1)
+        audio_settings["num_channels"] = 2
+        print('both players share the stereo audio device: ', audio_device_name_1)
+
+    if args["capture_source"] != 'sdl':
+        audio_settings["capture_source"] = args["capture_source"]
+        print('capture source: {}'.format(args["capture_source"]))
+
+    if args["pitch_backend"] not in ['aubio', 'numpy']:
+        print('{} is not a valid pitch backend, {}'.format(args['pitch_backend'], ['aubio', 'numpy']))
+        sys.exit()
+    audio_settings["pitch_backend"] = args["pitch_backend"]
+    print('pitch backend: {}'.format(args["pitch_backend"]))
+
+    try:
+        for key in ["pitch_filter_1", "pitch_filter_2"]:
+            make_pitch_filter(args[key])
+    except ValueError as e:
+        print('invalid pitch filter: {}'.format(e))
+        sys.exit()
+    audio_settings["pitch_filters"] = [args["pitch_filter_1"], args["pitch_filter_2"]]
+
+    if args["telemetry"]:
+        audio_settings["telemetry_path"] = args["telemetry"]
+        print('audio telemetry: {}'.format(args["telemetry"]))
+
+    if args["record"]:
+        audio_settings["record_path"] = args["record"]
+        print('recording session to: {}'.format(args["record"]))
+
+    if args["decimation"] > 1:
+        audio_settings["decimation"] = args["decimation"]
+        print('pitch detection runs at 1/{} of the sample rate'.format(args["decimation"]))
+
+    if args["no_voice_gate"]:
+        audio_settings["voice_gate"] = False
+
+    if args["fixed_range"]:
+        audio_settings["auto_range"] = False
+
+    if args["calibrate_latency"]:
+        audio_settings["calibrate_latency"] = True
+
+    if args["pitch_workers"] is not None:
+        audio_settings["use_pitch_worker"] = True
+        if args["pitch_workers"] > 0:
+            audio_settings["num_workers"] = args["pitch_workers"]
+        print('pitch detection runs in worker processes')
+
     if args['clean']:
         data.tools.clean_files()
     else:
-        main(args['fullscreen'], difficulty, size, audio_device_name_1, audio_device_name_2)
+        main(args['fullscreen'], difficulty, size, audio_device_name_1, audio_device_name_2, audio_settings, args['fps'],
+             args['dirty_rects'])
 
     pg.quit()
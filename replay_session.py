@@ -0,0 +1,117 @@
+#!/usr/bin/env python
+
+import argparse
+import json
+import os
+import time
+import numpy as np
+
+# pygame greets on stdout when imported, which would corrupt the JSON report
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+from data.audio_input import MicController
+from data.session_recorder import SessionRecorder
+
+parser = argparse.ArgumentParser(description='Run the pitch-to-paddle pipeline on a recorded or synthetic signal')
+parser.add_argument(
+    'source',
+    help="file:<path to .wav, .npy or recorded .samples> or synthetic:<sine, glide, vibrato, noise>")
+parser.add_argument('--sample_rate', type=int, default=44100)
+parser.add_argument('--buffer_size', type=int, default=1024)
+parser.add_argument('--channels', type=int, default=1)
+parser.add_argument('--pitch_backend', default='aubio')
+parser.add_argument('--pitch_filter', default='moving_average', help="See data.pitch_filters.make_pitch_filter")
+parser.add_argument('--fixed_range', action='store_true', help="Map MIDI 40 to 60 instead of adapting to the voice")
+parser.add_argument('--decimation', type=int, default=1, help="Downsample by 2, 4 or 8 before pitch detection")
+parser.add_argument('--no_voice_gate', action='store_true', help="Analyse every hop instead of skipping silence")
+parser.add_argument('--fps', type=float, default=60, help="Simulated game loop rate")
+parser.add_argument('--realtime', action='store_true', help="Replay at realtime pace instead of as fast as possible")
+parser.add_argument('--telemetry', help="Append the audio telemetry snapshot as a JSON line to this file")
+parser.add_argument('--record', help="Record samples and pitch records into this directory, see data.session_recorder")
+parser.add_argument('--positions', help="Write the per-frame paddle positions as JSON to this file")
+args = parser.parse_args()
+
+hop_duration = args.buffer_size / args.sample_rate
+
+
+def audio_clock():
+    # Hops are stamped in signal time so timestamps and frame times agree when replaying faster than realtime
+    return (mic_controller.capture_source.chunks_pushed + 1) * hop_duration
+
+
+recorder = SessionRecorder(args.record) if args.record else None
+mic_controller = MicController(
+    device_name=args.source,
+    sample_rate=args.sample_rate,
+    buffer_size=args.buffer_size,
+    pitch_tolerance=0.8,
+    min_confidence=0.0,
+    num_channels=args.channels,
+    pitch_backend=args.pitch_backend,
+    capture_source=args.source,
+    realtime=args.realtime,
+    clock=audio_clock,
+    auto_range=not args.fixed_range,
+    voice_gate=not args.no_voice_gate,
+    decimation=args.decimation,
+    recorder=recorder,
+)
+for channel in mic_controller.channels:
+    channel.set_pitch_filter(args.pitch_filter)
+source = mic_controller.capture_source
+source.loop = False
+
+frame_duration = 1.0 / args.fps
+next_frame_time = 0.0
+frames = []
+
+start_time = time.perf_counter()
+while source.push_next():
+    audio_time = source.chunks_pushed * hop_duration
+    if args.realtime:
+        time.sleep(max(0.0, start_time + audio_time - time.perf_counter()))
+
+    # The game loop samples the paddle position whenever a frame is due
+    while next_frame_time <= audio_time:
+        positions = [channel.get_normalized_position(next_frame_time) for channel in mic_controller.channels]
+        ranges = [[channel.min_pitch, channel.max_pitch] for channel in mic_controller.channels]
+        frames.append({"time": next_frame_time, "positions": [float(p) for p in positions], "ranges": ranges})
+        next_frame_time += frame_duration
+elapsed = time.perf_counter() - start_time
+
+summary = {
+    "source": args.source,
+    "hops": source.chunks_pushed,
+    "audio_seconds": source.duration,
+    "elapsed_seconds": elapsed,
+    "hops_per_second": source.chunks_pushed / elapsed,
+    "realtime_factor": source.duration / elapsed,
+}
+
+ground_truth = getattr(source, "ground_truth", None)
+if ground_truth is not None:
+    # Compare against the known pitch, mapped with the range of that frame, wherever the paddle is not clipped
+    errors = []
+    for frame in frames:
+        sample_index = min(int(frame["time"] * args.sample_rate), len(ground_truth) - 1)
+        min_pitch, max_pitch = frame["ranges"][0]
+        expected = (ground_truth[sample_index] - min_pitch) / (max_pitch - min_pitch)
+        position = frame["positions"][0]
+        if position >= 0 and 0 < expected < 1:
+            errors.append(abs(position - expected))
+    if errors:
+        summary["mean_position_error"] = float(np.mean(errors))
+    summary["final_range"] = frames[-1]["ranges"][0] if frames else None
+
+print(json.dumps(summary, indent=2))
+
+if args.telemetry:
+    with open(args.telemetry, "a") as f:
+        f.write(json.dumps(mic_controller.get_telemetry()) + "\n")
+
+if args.positions:
+    with open(args.positions, "w") as f:
+        json.dump(frames, f)
+
+mic_controller.close()
+if recorder is not None:
+    recorder.close()
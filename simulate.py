@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+
+import argparse
+import json
+import os
+import time
+import numpy as np
+
+# pygame greets on stdout when imported, which would corrupt the JSON report
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+import pygame as pg
+from data import simulation
+from data.session_recorder import load_session
+
+parser = argparse.ArgumentParser(description='Play seeded classic matches without window, sound or microphones')
+parser.add_argument('--matches', type=int, default=100)
+parser.add_argument('--seed', type=int, default=0, help="Match i is played with seed + i")
+parser.add_argument('--difficulty', default='medium', choices=['easy', 'medium', 'hard'])
+parser.add_argument(
+    '--right',
+    default='tracking',
+    help="Right player: tracking[:error,silence], random[:step] or session:<directory recorded with game.py -r>")
+parser.add_argument('--left', help="Left player, same choices as --right. Without it the AI plays left")
+parser.add_argument('--width', type=int, default=800)
+parser.add_argument('--height', type=int, default=600)
+parser.add_argument('--physics_rate', type=int, default=240, help="Fixed simulation steps per second")
+parser.add_argument('--fps', type=int, default=60, help="Simulated game loop rate at which inputs are read")
+parser.add_argument('--max_time', type=float, default=600, help="Give up on a match after this many game seconds")
+parser.add_argument('--output', help="Write the JSON results to this file instead of stdout")
+args = parser.parse_args()
+
+
+def session_positions(directory, player, fps):
+    # Hops arrive at the hop rate, the game loop holds the latest position until the next frame
+    hops = load_session(directory)[player]["hops"]
+    frame_times = np.arange(hops["timestamp"][0], hops["timestamp"][-1], 1.0 / fps)
+    indices = np.searchsorted(hops["timestamp"], frame_times, side="right") - 1
+    return hops["position"][indices]
+
+
+def make_input(spec, seed, player):
+    kind, _, options = spec.partition(":")
+    if kind == "tracking":
+        return simulation.TrackingInput(*[float(o) for o in options.split(",") if o], seed=seed)
+    if kind == "random":
+        return simulation.RandomInput(*[float(o) for o in options.split(",") if o], seed=seed)
+    if kind == "session":
+        return simulation.ScriptedInput(session_positions(options, player, args.fps))
+    raise ValueError("Unknown input: {}".format(spec))
+
+
+screen_rect = pg.Rect(0, 0, args.width, args.height)
+num_players = 2 if args.left else 1
+steps_per_read = max(1, args.physics_rate // args.fps)
+
+results = []
+start_time = time.perf_counter()
+for i in range(args.matches):
+    seed = args.seed + i
+    match = simulation.Match(screen_rect, args.difficulty, num_players, seed=seed)
+    right_input = make_input(args.right, seed, 0)
+    # The left player gets another seed, or both would make the same mistakes
+    left_input = make_input(args.left, seed + args.matches, 1) if args.left else None
+    result = simulation.run_match(
+        match, right_input, left_input, 1.0 / args.physics_rate, steps_per_read, args.max_time)
+    result["seed"] = seed
+    results.append(result)
+elapsed = time.perf_counter() - start_time
+
+steps = sum(result["steps"] for result in results)
+game_seconds = sum(result["game_seconds"] for result in results)
+winners = [result["winner"] for result in results]
+summary = {
+    "matches": args.matches,
+    "left_wins": winners.count(0),
+    "right_wins": winners.count(1),
+    "unfinished": winners.count(None),
+    "mean_rallies": float(np.mean([result["rallies"] for result in results])) if results else 0.0,
+    "game_seconds": game_seconds,
+    "elapsed_seconds": elapsed,
+    "steps_per_second": steps / elapsed,
+    "realtime_factor": game_seconds / elapsed,
+    "results": results,
+}
+
+if args.output:
+    with open(args.output, "w") as f:
+        json.dump(summary, f, indent=2)
+else:
+    print(json.dumps(summary, indent=2))